@@ -59,8 +59,14 @@ REST_FRAMEWORK ={
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES':[
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
-    ]
+        'users.authentication.CachedJWTAuthentication'
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'signup': config('THROTTLE_SIGNUP_RATE', default='5/hour'),
+        'verify': config('THROTTLE_VERIFY_RATE', default='10/hour'),
+        'resend_code': config('THROTTLE_RESEND_CODE_RATE', default='3/hour'),
+        'forgot_password': config('THROTTLE_FORGOT_PASSWORD_RATE', default='5/hour'),
+    },
 
 }
 
@@ -142,6 +148,38 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='instagram-clone'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int),
+            'CULL_FREQUENCY': config('CACHE_CULL_FREQUENCY', default=3, cast=int),
+        },
+    },
+    # Pending verification codes only. Kept apart from the default cache so that
+    # feed and detail entries never push a code out before it expires; size it
+    # above the number of codes that can be pending at once.
+    'verification': {
+        'BACKEND': config('VERIFICATION_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('VERIFICATION_CACHE_LOCATION', default='instagram-clone-verification'),
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('VERIFICATION_CACHE_MAX_ENTRIES', default=1000000, cast=int),
+        },
+    },
+}
+
+POST_DETAIL_CACHE_TIMEOUT = config('POST_DETAIL_CACHE_TIMEOUT', default=300, cast=int)
+COMMENT_TREE_CACHE_TIMEOUT = config('COMMENT_TREE_CACHE_TIMEOUT', default=300, cast=int)
+
+SINGLE_FLIGHT_LOCK_TIMEOUT = config('SINGLE_FLIGHT_LOCK_TIMEOUT', default=10, cast=int)
+SINGLE_FLIGHT_WAIT = config('SINGLE_FLIGHT_WAIT', default=2.0, cast=float)
+SINGLE_FLIGHT_POLL_INTERVAL = config('SINGLE_FLIGHT_POLL_INTERVAL', default=0.05, cast=float)
+SINGLE_FLIGHT_STALE_TIMEOUT = config('SINGLE_FLIGHT_STALE_TIMEOUT', default=3600, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -180,14 +218,84 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR/'media/'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'shared.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+IMAGE_VARIANT_SIZES = (150, 640, 1080)
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
+IMAGE_VARIANT_MAX_PENDING = config('IMAGE_VARIANT_MAX_PENDING', default=32, cast=int)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'users.User'
 
+GENERATED_USERNAME_PREFIX = 'instagram_'
+USERNAME_BLOCK_SIZE = config('USERNAME_BLOCK_SIZE', default=1000, cast=int)
+
+TOKEN_PRUNE_INTERVAL = config('TOKEN_PRUNE_INTERVAL', default=3600, cast=int)
+AUTH_USER_CACHE_TIMEOUT = config('AUTH_USER_CACHE_TIMEOUT', default=60, cast=int)
+JWT_TRUST_CLAIMS_FOR_READS = config('JWT_TRUST_CLAIMS_FOR_READS', default=False, cast=bool)
+
+VERIFICATION_CODE_STORE = config('VERIFICATION_CODE_STORE', default='users.verification.CacheCodeStore')
+
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 
+JOB_QUEUE_EAGER = config('JOB_QUEUE_EAGER', default=False, cast=bool)
+JOB_WORKERS = config('JOB_WORKERS', default=4, cast=int)
+JOB_POLL_INTERVAL = config('JOB_POLL_INTERVAL', default=1.0, cast=float)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=5, cast=int)
+JOB_RETRY_BACKOFF = config('JOB_RETRY_BACKOFF', default=10, cast=int)
+JOB_RETRY_BACKOFF_MAX = config('JOB_RETRY_BACKOFF_MAX', default=3600, cast=int)
+JOB_LOCK_TIMEOUT = config('JOB_LOCK_TIMEOUT', default=300, cast=int)
+
+EMAIL_BATCH_SIZE = config('EMAIL_BATCH_SIZE', default=50, cast=int)
+EMAIL_FLUSH_INTERVAL = config('EMAIL_FLUSH_INTERVAL', default=2.0, cast=float)
+
+SMS_TRANSPORT = config('SMS_TRANSPORT', default='shared.sms.TwilioTransport')
+SMS_FROM_NUMBER = config('SMS_FROM_NUMBER', default='+998934542418')
+SMS_MAX_IN_FLIGHT = config('SMS_MAX_IN_FLIGHT', default=8, cast=int)
+SMS_BATCH_SIZE = config('SMS_BATCH_SIZE', default=50, cast=int)
+SMS_TIMEOUT = config('SMS_TIMEOUT', default=10.0, cast=float)
+
+COMMENT_TREE_MAX_DEPTH = config('COMMENT_TREE_MAX_DEPTH', default=5, cast=int)
+COMMENT_TREE_MAX_REPLIES = config('COMMENT_TREE_MAX_REPLIES', default=50, cast=int)
+
+LIKE_WRITE_BEHIND = config('LIKE_WRITE_BEHIND', default=False, cast=bool)
+LIKE_FLUSH_INTERVAL = config('LIKE_FLUSH_INTERVAL', default=1.0, cast=float)
+LIKE_BUFFER_MAX = config('LIKE_BUFFER_MAX', default=5000, cast=int)
+LIKE_BUFFER_BATCH_SIZE = config('LIKE_BUFFER_BATCH_SIZE', default=500, cast=int)
+LIKE_INTENT_TIMEOUT = config('LIKE_INTENT_TIMEOUT', default=60, cast=int)
+
+TIMELINE_CELEBRITY_FOLLOWERS = config('TIMELINE_CELEBRITY_FOLLOWERS', default=10000, cast=int)
+TIMELINE_FANOUT_BATCH_SIZE = config('TIMELINE_FANOUT_BATCH_SIZE', default=1000, cast=int)
+TIMELINE_BACKFILL_SIZE = config('TIMELINE_BACKFILL_SIZE', default=50, cast=int)
+
+# Text search configuration used for the tsvector columns on PostgreSQL; run rebuild_search_index after changing it.
+SEARCH_CONFIG = config('SEARCH_CONFIG', default='english')
+SEARCH_MAX_TERMS = config('SEARCH_MAX_TERMS', default=8, cast=int)
+
+POST_MAX_HASHTAGS = config('POST_MAX_HASHTAGS', default=30, cast=int)
+TAG_AUTOCOMPLETE_LIMIT = config('TAG_AUTOCOMPLETE_LIMIT', default=10, cast=int)
+
+TRENDING_INTERVAL = config('TRENDING_INTERVAL', default=300, cast=int)
+TRENDING_WINDOW_HOURS = config('TRENDING_WINDOW_HOURS', default=72, cast=int)
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=12.0, cast=float)
+TRENDING_COMMENT_WEIGHT = config('TRENDING_COMMENT_WEIGHT', default=2.0, cast=float)
+TRENDING_SIZE = config('TRENDING_SIZE', default=500, cast=int)
+
+SIMILAR_POSTS_INTERVAL = config('SIMILAR_POSTS_INTERVAL', default=600, cast=int)
+SIMILAR_POSTS_SIZE = config('SIMILAR_POSTS_SIZE', default=20, cast=int)
+SIMILAR_POSTS_MIN_CO_LIKES = config('SIMILAR_POSTS_MIN_CO_LIKES', default=2, cast=int)
+SIMILAR_POSTS_CHUNK_SIZE = config('SIMILAR_POSTS_CHUNK_SIZE', default=512, cast=int)
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {
@@ -0,0 +1,95 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from shared.custom_pagination import KeysetPagination
+from .cache import aget_post_detail, get_comment_trees
+from .mixins import aliked_post_ids, aliked_comment_ids
+from .models import Post, PostComment
+from .serializers import PostSerializer, CommentSerializer
+
+
+class AsyncReadView(View):
+    """
+    Base for the read-only endpoints served natively under ASGI. DRF views are
+    synchronous, so these are plain Django async views that reuse DRF's request
+    wrapper, authentication classes and serializers, and answer with the same JSON.
+    The serializers get everything they need through their context up front, so
+    rendering never touches the database from the event loop.
+    """
+    http_method_names = ['get']
+    trust_token_claims = True
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            request = await self.initialize_request(request, *args, **kwargs)
+            data = await self.read(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        except APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return JsonResponse(detail, status=exc.status_code, encoder=JSONEncoder, safe=False)
+        return JsonResponse(data, encoder=JSONEncoder, safe=False)
+
+    async def initialize_request(self, request, *args, **kwargs):
+        request = Request(request, parser_context={'view': self, 'args': args, 'kwargs': kwargs})
+        user, auth = AnonymousUser(), None
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            result = await sync_to_async(authentication_class().authenticate)(request)
+            if result is not None:
+                user, auth = result
+                break
+        request.user, request.auth = user, auth
+        return request
+
+    async def read(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+
+class AsyncPostListView(AsyncReadView):
+    pagination_class = KeysetPagination
+
+    async def read(self, request):
+        paginator = self.pagination_class()
+        posts = await paginator.apaginate_queryset(Post.objects.select_related('author'), request)
+        liked_post_ids = await aliked_post_ids(request.user, posts)
+        serializer = PostSerializer(posts, many=True, context={'request': request, 'liked_post_ids': liked_post_ids})
+        return paginator.get_paginated_response(serializer.data).data
+
+
+class AsyncPostDetailView(AsyncReadView):
+
+    async def read(self, request, pk):
+        return await aget_post_detail(pk, request)
+
+
+class AsyncPostCommentListView(AsyncReadView):
+
+    async def read(self, request, pk):
+        # The comments, their reply trees and the viewer's likes only depend on the post, so they load together.
+        comments = PostComment.objects.filter(post_id=pk, parent=None).select_related('author')
+        comments, comment_children, liked_comment_ids = await asyncio.gather(
+            self.fetch(comments),
+            sync_to_async(get_comment_trees)({pk}),
+            aliked_comment_ids(request.user, [pk]),
+        )
+        if not comments and not await Post.objects.filter(pk=pk).aexists():
+            raise Http404
+        context = {
+            'request': request,
+            'comment_children': comment_children,
+            'liked_comment_ids': liked_comment_ids,
+        }
+        return CommentSerializer(comments, many=True, context=context).data
+
+    @staticmethod
+    async def fetch(queryset):
+        return [row async for row in queryset]
@@ -0,0 +1,90 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+
+from shared.singleflight import cached_single_flight, invalidate
+from .comment_tree import load_comment_tree
+from .like_buffer import pending_intents
+from .models import Post, PostLike
+from .serializers import PostSerializer
+
+
+def post_detail_cache_key(post_id):
+    return f"post:detail:{post_id}"
+
+
+def comment_tree_cache_key(post_id):
+    return f"post:comment-tree:{post_id}"
+
+
+def invalidate_post_detail(post_id, deleted=False):
+    invalidate(post_detail_cache_key(post_id), drop_stale=deleted)
+
+
+def invalidate_comment_tree(post_id, deleted=False):
+    invalidate(comment_tree_cache_key(post_id), drop_stale=deleted)
+
+
+def get_post_detail(post_id, request):
+    """
+    Read-through cache for the serialized post. Only the viewer-independent
+    part is cached; ``me_liked`` is resolved for the requesting user afterwards.
+    URLs in the payload are built from the request that populated the entry.
+    """
+    data = dict(post_detail_payload(post_id, request))
+    data['me_liked'] = viewer_liked(post_id, request.user)
+    return data
+
+
+async def aget_post_detail(post_id, request):
+    """
+    ``get_post_detail`` for async views: the cached payload and the viewer's like
+    are looked up concurrently, and only a cache miss falls back to a thread.
+    """
+    async def payload():
+        data = await cache.aget(post_detail_cache_key(post_id))
+        if data is None:
+            data = await sync_to_async(post_detail_payload)(post_id, request)
+        return dict(data)
+
+    data, liked = await asyncio.gather(payload(), aviewer_liked(post_id, request.user))
+    data['me_liked'] = liked
+    return data
+
+
+def post_detail_payload(post_id, request):
+    def compute():
+        post = get_object_or_404(Post.objects.select_related('author'), pk=post_id)
+        payload = dict(PostSerializer(post, context={'request': request, 'liked_post_ids': set()}).data)
+        payload.pop('me_liked')
+        return payload
+
+    return cached_single_flight(post_detail_cache_key(post_id), compute, settings.POST_DETAIL_CACHE_TIMEOUT)
+
+
+def viewer_liked(post_id, user):
+    liked = pending_intents(Post, user).get(post_id)
+    if liked is None:
+        liked = user.is_authenticated and PostLike.objects.filter(post_id=post_id, author=user).exists()
+    return liked
+
+
+async def aviewer_liked(post_id, user):
+    liked = pending_intents(Post, user).get(post_id)
+    if liked is None:
+        liked = user.is_authenticated and await PostLike.objects.filter(post_id=post_id, author=user).aexists()
+    return liked
+
+
+def get_comment_trees(post_ids):
+    tree = {}
+    for post_id in post_ids:
+        tree.update(cached_single_flight(
+            comment_tree_cache_key(post_id),
+            lambda post_id=post_id: load_comment_tree([post_id]),
+            settings.COMMENT_TREE_CACHE_TIMEOUT,
+        ))
+    return tree
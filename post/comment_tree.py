@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import PostComment
+
+
+def load_comment_tree(post_ids, max_depth=None, max_replies=None):
+    """
+    Fetches every comment of the given posts in one query and returns a
+    ``{comment_id: [replies]}`` map, trimmed to ``max_depth`` reply levels
+    and ``max_replies`` replies per comment.
+    """
+    if max_depth is None:
+        max_depth = settings.COMMENT_TREE_MAX_DEPTH
+    if max_replies is None:
+        max_replies = settings.COMMENT_TREE_MAX_REPLIES
+
+    comments = (
+        PostComment.objects.filter(post_id__in=post_ids)
+        .select_related('author')
+        .order_by('created_at', 'id')
+    )
+    children = defaultdict(list)
+    for comment in comments:
+        children[comment.parent_id].append(comment)
+
+    tree = {}
+    level = children.get(None, [])
+    for _ in range(max_depth):
+        next_level = []
+        for comment in level:
+            replies = children.get(comment.pk, [])[:max_replies]
+            tree[comment.pk] = replies
+            next_level.extend(replies)
+        if not next_level:
+            break
+        level = next_level
+    return tree
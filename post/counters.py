@@ -0,0 +1,38 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import User, UserFollow
+from .models import Post, PostComment, PostLike, CommentLike, Tag, TaggedPost
+
+
+def adjust_counter(model, pk, field, delta):
+    # Single UPDATE ... SET field = field + delta, never dropping below zero.
+    return model.objects.filter(pk=pk).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def _count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+def rebuild_counters():
+    posts = Post.objects.update(
+        likes_count=_count_subquery(PostLike, 'post'),
+        comments_count=_count_subquery(PostComment, 'post'),
+    )
+    comments = PostComment.objects.update(likes_count=_count_subquery(CommentLike, 'comment'))
+    tags = Tag.objects.update(posts_count=_count_subquery(TaggedPost, 'tag'))
+    # Deleting a user cascades their follows without touching the other side's counters.
+    users = User.objects.update(
+        followers_count=_count_subquery(UserFollow, 'following'),
+        following_count=_count_subquery(UserFollow, 'follower'),
+    )
+    return posts, comments, tags, users
@@ -0,0 +1,194 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+
+def _intents_key(user_id):
+    return f"like-intents:{user_id}"
+
+
+def remember_intent(target_model, user_id, target_id, liked):
+    # Per-user map of unflushed likes, shared between processes, so the author sees them on the next read.
+    key = _intents_key(user_id)
+    intents = cache.get(key) or {}
+    intents[f"{target_model._meta.label_lower}:{target_id}"] = liked
+    cache.set(key, intents, settings.LIKE_INTENT_TIMEOUT)
+
+
+def pending_intents(target_model, user):
+    """
+    ``{target_id: liked}`` for the likes of ``target_model`` rows that ``user``
+    made recently and that may not have been flushed yet.
+    """
+    if not settings.LIKE_WRITE_BEHIND or not user.is_authenticated:
+        return {}
+    prefix = f"{target_model._meta.label_lower}:"
+    to_pk = target_model._meta.pk.to_python
+    intents = cache.get(_intents_key(user.pk)) or {}
+    return {to_pk(name[len(prefix):]): liked for name, liked in intents.items() if name.startswith(prefix)}
+
+
+def merge_pending(target_model, user, liked_ids):
+    liked_ids = set(liked_ids)
+    for target_id, liked in pending_intents(target_model, user).items():
+        if liked:
+            liked_ids.add(target_id)
+        else:
+            liked_ids.discard(target_id)
+    return liked_ids
+
+
+class LikeBuffer:
+    """
+    Write-behind buffer for ``LIKE_WRITE_BEHIND``: like and unlike intents are
+    collected in memory, the last one per user and target winning, and written by
+    a background thread every ``LIKE_FLUSH_INTERVAL`` seconds (sooner once
+    ``LIKE_BUFFER_MAX`` intents are waiting). A flush is one bulk insert, one bulk
+    delete and one counter UPDATE per distinct delta, instead of a write per tap.
+
+    Intents still in memory when the process dies are lost; ``rebuild_counters``
+    repairs the counters, the like rows simply never appear.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._intents = {}
+        self._wake = threading.Event()
+        self._thread = None
+
+    def state(self, relation, user_id, target_id):
+        with self._lock:
+            liked = self._intents.get((relation, user_id, target_id))
+        if liked is None:
+            liked = (cache.get(_intents_key(user_id)) or {}).get(
+                f"{relation.target_model._meta.label_lower}:{target_id}"
+            )
+        if liked is None:
+            liked = relation.model.objects.filter(author_id=user_id, **{relation.target.attname: target_id}).exists()
+        return liked
+
+    def record(self, relation, user_id, target_id, liked):
+        """
+        Queues the intent and returns whether it changes the like as the user sees
+        it, or None when liking a target that does not exist.
+        """
+        if self.state(relation, user_id, target_id) == liked:
+            return False
+        if liked and not relation.target_exists(target_id):
+            return None
+        with self._lock:
+            self._intents[(relation, user_id, target_id)] = liked
+            full = len(self._intents) >= settings.LIKE_BUFFER_MAX
+        remember_intent(relation.target_model, user_id, target_id, liked)
+        self._ensure_thread()
+        if full:
+            self._wake.set()
+        return True
+
+    def flush(self):
+        with self._lock:
+            intents, self._intents = self._intents, {}
+        if not intents:
+            return 0
+
+        by_relation = defaultdict(dict)
+        for (relation, user_id, target_id), liked in intents.items():
+            by_relation[relation][(user_id, target_id)] = liked
+
+        written = 0
+        try:
+            for relation, changes in by_relation.items():
+                written += self._apply(relation, changes)
+                for key in changes:
+                    intents.pop((relation,) + key)
+        except Exception:
+            # Put back what was not written, unless a newer intent arrived meanwhile.
+            with self._lock:
+                for key, liked in intents.items():
+                    self._intents.setdefault(key, liked)
+            raise
+        return written
+
+    def _apply(self, relation, changes):
+        target_field = relation.target.attname
+        with transaction.atomic():
+            # Locking the targets serializes flushes from different processes touching the same rows.
+            targets = dict(
+                relation.target_model.objects.select_for_update()
+                .filter(pk__in={target_id for _, target_id in changes})
+                .order_by('pk')
+                .values_list('pk', relation.post_column)
+            )
+            changes = {key: liked for key, liked in changes.items() if key[1] in targets}
+            if not changes:
+                return 0
+            existing = set(
+                relation.model.objects.filter(
+                    author_id__in={user_id for user_id, _ in changes},
+                    **{f'{target_field}__in': {target_id for _, target_id in changes}},
+                ).values_list('author_id', target_field)
+            )
+            added = [key for key, liked in changes.items() if liked and key not in existing]
+            removed = [key for key, liked in changes.items() if not liked and key in existing]
+
+            relation.model.objects.bulk_create(
+                [relation.model(author_id=user_id, **{target_field: target_id}) for user_id, target_id in added],
+                ignore_conflicts=True,
+                batch_size=settings.LIKE_BUFFER_BATCH_SIZE,
+            )
+            for start in range(0, len(removed), settings.LIKE_BUFFER_BATCH_SIZE):
+                batch = removed[start:start + settings.LIKE_BUFFER_BATCH_SIZE]
+                relation.model.objects.filter(
+                    reduce(or_, (Q(author_id=user_id, **{target_field: target_id}) for user_id, target_id in batch))
+                ).delete()
+
+            deltas = defaultdict(int)
+            for _, target_id in added:
+                deltas[target_id] += 1
+            for _, target_id in removed:
+                deltas[target_id] -= 1
+            by_delta = defaultdict(list)
+            for target_id, delta in deltas.items():
+                if delta:
+                    by_delta[delta].append(target_id)
+            counter = relation.counter_field
+            for delta, target_ids in by_delta.items():
+                relation.target_model.objects.filter(pk__in=target_ids).update(
+                    **{counter: Greatest(F(counter) + delta, 0)}
+                )
+
+            post_ids = {targets[target_id] for target_id in deltas}
+            transaction.on_commit(lambda: [relation.invalidate(post_id) for post_id in post_ids])
+        return len(added) + len(removed)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='like-buffer', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(settings.LIKE_FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not flush buffered likes")
+            finally:
+                connection.close()
+
+
+like_buffer = LikeBuffer()
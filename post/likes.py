@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from .cache import invalidate_post_detail, invalidate_comment_tree
+from .like_buffer import like_buffer
+from .models import Post, PostLike, CommentLike
+
+
+class LikeRelation:
+    """
+    Likes of one kind (post or comment) written with plain SQL so that a call is
+    a single write round trip on PostgreSQL: ``INSERT ... ON CONFLICT DO NOTHING``
+    or ``DELETE ... RETURNING``, with the counter update chained in a CTE (a
+    toggle chains both). Other databases run the same statements back to back
+    in a transaction.
+
+    Every method returns whether the like state changed. The raw statements do not
+    send model signals, so the cache invalidation those would do happens here.
+    With ``LIKE_WRITE_BEHIND`` the writes go through ``like_buffer`` instead.
+    """
+
+    def __init__(self, model, target_field, counter_field, post_column, invalidate):
+        self.model = model
+        self.target = model._meta.get_field(target_field)
+        self.target_model = self.target.related_model
+        self.counter_field = counter_field
+        self.post_column = post_column
+        self.invalidate = invalidate
+
+    def set(self, user, target_id, liked):
+        return self.like(user, target_id) if liked else self.unlike(user, target_id)
+
+    def toggle(self, user, target_id):
+        """
+        Flips the like and returns the new state, or None when the target does not exist.
+        """
+        if settings.LIKE_WRITE_BEHIND or connection.vendor != 'postgresql':
+            with transaction.atomic():
+                if self.unlike(user, target_id):
+                    return False
+                if self.like(user, target_id):
+                    return True
+                return True if self.target_exists(target_id) else None
+
+        qn = connection.ops.quote_name
+        target_table = qn(self.target_model._meta.db_table)
+        counter = qn(self.counter_field)
+        delete_sql, delete_params = self._delete_sql(user, target_id)
+        # The insert only runs when the delete found nothing, so one statement flips either way.
+        insert_sql, insert_params = self._insert_sql(user, target_id, "AND NOT EXISTS (SELECT 1 FROM deleted)")
+        column = qn(self.target.column)
+        sql = (
+            f"WITH deleted AS ({delete_sql}), inserted AS ({insert_sql}), "
+            f"changed AS (SELECT {column}, -1 AS delta FROM deleted UNION ALL SELECT {column}, 1 FROM inserted), "
+            f"counted AS ("
+            f"UPDATE {target_table} SET {counter} = CASE WHEN {counter} + changed.delta < 0 THEN 0 "
+            f"ELSE {counter} + changed.delta END "
+            f"FROM changed WHERE {target_table}.{qn('id')} = changed.{column} "
+            f"RETURNING {target_table}.{qn(self.post_column)} AS post, changed.delta AS delta) "
+            f"SELECT counted.delta, counted.post, EXISTS (SELECT 1 FROM {target_table} WHERE {qn('id')} = %s) "
+            f"FROM (SELECT 1) AS one LEFT JOIN counted ON TRUE"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, delete_params + insert_params + [self.target_pk(target_id)])
+            delta, post_id, exists = cursor.fetchone()
+        if delta is None:
+            # Nothing changed: the target is missing, or a concurrent like got there first.
+            return True if exists else None
+        post_id = Post._meta.pk.to_python(post_id)
+        transaction.on_commit(lambda: self.invalidate(post_id))
+        return delta > 0
+
+    def target_exists(self, target_id):
+        return self.target_model.objects.filter(pk=target_id).exists()
+
+    def like(self, user, target_id):
+        if settings.LIKE_WRITE_BEHIND:
+            return like_buffer.record(self, user.pk, target_id, True)
+        sql, params = self._insert_sql(user, target_id)
+        return self._write(sql, params, 1)
+
+    def unlike(self, user, target_id):
+        if settings.LIKE_WRITE_BEHIND:
+            return like_buffer.record(self, user.pk, target_id, False)
+        sql, params = self._delete_sql(user, target_id)
+        return self._write(sql, params, -1)
+
+    @property
+    def author_column(self):
+        return self.model._meta.get_field('author').column
+
+    def target_pk(self, target_id):
+        return self.target_model._meta.pk.get_db_prep_value(target_id, connection)
+
+    def _insert_sql(self, user, target_id, condition=''):
+        like = self.model(author_id=user.pk, **{self.target.attname: target_id})
+        fields = self.model._meta.concrete_fields
+        values = [field.get_db_prep_save(field.pre_save(like, add=True), connection) for field in fields]
+        qn = connection.ops.quote_name
+        # Selecting the values from the target row inserts nothing when the target does not exist.
+        sql = (
+            f"INSERT INTO {qn(self.model._meta.db_table)} ({', '.join(qn(field.column) for field in fields)}) "
+            f"SELECT {', '.join(['%s'] * len(fields))} FROM {qn(self.target_model._meta.db_table)} "
+            f"WHERE {qn('id')} = %s {condition} "
+            f"ON CONFLICT ({qn(self.author_column)}, {qn(self.target.column)}) DO NOTHING "
+            f"RETURNING {qn(self.target.column)}"
+        )
+        return sql, values + [self.target_pk(target_id)]
+
+    def _delete_sql(self, user, target_id):
+        qn = connection.ops.quote_name
+        sql = (
+            f"DELETE FROM {qn(self.model._meta.db_table)} "
+            f"WHERE {qn(self.author_column)} = %s AND {qn(self.target.column)} = %s "
+            f"RETURNING {qn(self.target.column)}"
+        )
+        author_pk = self.model._meta.get_field('author').target_field.get_db_prep_value(user.pk, connection)
+        return sql, [author_pk, self.target_pk(target_id)]
+
+    def _counter_sql(self, delta, changed_rows):
+        qn = connection.ops.quote_name
+        counter = qn(self.counter_field)
+        return (
+            f"UPDATE {qn(self.target_model._meta.db_table)} "
+            f"SET {counter} = CASE WHEN {counter} + {delta} < 0 THEN 0 ELSE {counter} + {delta} END "
+            f"WHERE {qn('id')} IN ({changed_rows}) "
+            f"RETURNING {qn(self.post_column)}"
+        )
+
+    def _write(self, sql, params, delta):
+        qn = connection.ops.quote_name
+        if connection.vendor == 'postgresql':
+            changed_rows = f"SELECT {qn(self.target.column)} FROM changed"
+            with connection.cursor() as cursor:
+                cursor.execute(f"WITH changed AS ({sql}) {self._counter_sql(delta, changed_rows)}", params)
+                row = cursor.fetchone()
+        else:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                row = cursor.fetchone()
+                if row is not None:
+                    cursor.execute(self._counter_sql(delta, '%s'), [row[0]])
+                    row = cursor.fetchone()
+        if row is None:
+            return False
+        post_id = Post._meta.pk.to_python(row[0])
+        transaction.on_commit(lambda: self.invalidate(post_id))
+        return True
+
+
+post_likes = LikeRelation(PostLike, 'post', 'likes_count', 'id', invalidate_post_detail)
+comment_likes = LikeRelation(CommentLike, 'comment', 'likes_count', 'post_id', invalidate_comment_tree)
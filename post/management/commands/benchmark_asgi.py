@@ -0,0 +1,165 @@
+import asyncio
+import io
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from post.models import Post
+from users.models import User, DONE
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare read throughput of the sync views behind a threaded WSGI server with the "
+        "async views under ASGI, calling the Django handlers in-process at high concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=200, help="Requests in flight under ASGI.")
+        parser.add_argument('--wsgi-threads', type=int, default=16, help="Worker threads of the WSGI server.")
+        parser.add_argument('--sync-path', default='/post/list/')
+        parser.add_argument('--async-path', default='/post/async/list/')
+        parser.add_argument('--db-latency', type=float, default=0.002,
+                            help="Seconds added to every query, standing in for the network hop to Postgres.")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Create this many posts for the run and delete them afterwards.")
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        self.host = options['host']
+        user = self.seed(options['seed']) if options['seed'] else None
+        latency = options['db_latency']
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            if slow_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(slow_query)
+
+        if latency:
+            connection_created.connect(add_latency)
+            for connection in connections.all(initialized_only=True):
+                add_latency(None, connection)
+        try:
+            runs = [
+                ('WSGI, sync view', self.run_wsgi, options['sync_path'], options['wsgi_threads']),
+                ('ASGI, sync view', self.run_asgi, options['sync_path'], options['concurrency']),
+                ('ASGI, async view', self.run_asgi, options['async_path'], options['concurrency']),
+            ]
+            for label, run, path, concurrency in runs:
+                started = time.monotonic()
+                statuses, timings = run(path, options['requests'], concurrency)
+                self.report(f"{label} ({concurrency} concurrent)", statuses, timings, time.monotonic() - started)
+        finally:
+            connection_created.disconnect(add_latency)
+            for connection in connections.all(initialized_only=True):
+                if slow_query in connection.execute_wrappers:
+                    connection.execute_wrappers.remove(slow_query)
+            if user is not None:
+                user.delete()
+
+    def seed(self, count):
+        suffix = uuid.uuid4().hex[:8]
+        user = User.objects.create(username=f"bench_{suffix}", email=f"bench_{suffix}@example.com", AUTH_STATUS=DONE)
+        # Only the name is stored; the list endpoints never open the file.
+        Post.objects.bulk_create(
+            [Post(author=user, image='benchmark/placeholder.jpg', caption=f"benchmark {i}") for i in range(count)]
+        )
+        return user
+
+    def report(self, label, statuses, timings, elapsed):
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        codes = ', '.join(f"{code}: {n}" for code, n in sorted(statuses.items()))
+        self.stdout.write(
+            f"{label}: {len(timings) / elapsed:,.0f} req/s, "
+            f"p50 {statistics.median(timings) * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms ({codes})"
+        )
+
+    def run_wsgi(self, path, count, threads):
+        handler = WSGIHandler()
+        statuses, timings, lock = {}, [], threading.Lock()
+
+        def request(_):
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path,
+                'QUERY_STRING': '',
+                'SERVER_NAME': self.host,
+                'SERVER_PORT': '80',
+                'HTTP_HOST': self.host,
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': io.BytesIO(),
+                'wsgi.url_scheme': 'http',
+                'wsgi.errors': io.StringIO(),
+            }
+            result = {}
+            started = time.monotonic()
+            body = handler(environ, lambda status, headers: result.setdefault('status', int(status.split()[0])))
+            b''.join(body)
+            body.close()
+            with lock:
+                timings.append(time.monotonic() - started)
+                statuses[result['status']] = statuses.get(result['status'], 0) + 1
+
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(request, range(count)))
+        return statuses, timings
+
+    def run_asgi(self, path, count, concurrency):
+        handler = ASGIHandler()
+        statuses, timings = {}, []
+
+        async def request(slots):
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'root_path': '',
+                'query_string': b'',
+                'headers': [(b'host', self.host.encode())],
+                'client': ('127.0.0.1', 50000),
+                'server': (self.host, 80),
+            }
+            sent = asyncio.Event()
+
+            async def receive():
+                if not sent.is_set():
+                    sent.set()
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The handler listens for a disconnect that never comes; it cancels this itself.
+                await asyncio.Future()
+
+            status = {}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status['code'] = message['status']
+
+            async with slots:
+                started = time.monotonic()
+                await handler(scope, receive, send)
+                timings.append(time.monotonic() - started)
+            statuses[status['code']] = statuses.get(status['code'], 0) + 1
+
+        async def main():
+            slots = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(request(slots) for _ in range(count)))
+
+        asyncio.run(main())
+        return statuses, timings
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from post.trending import compute_trending, schedule_trending
+
+
+class Command(BaseCommand):
+    help = "Recompute the trending ranking served by /post/trending/."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedule', action='store_true',
+                            help="Also queue the periodic trending job for the run_jobs worker.")
+
+    def handle(self, *args, **options):
+        ranked = compute_trending()
+        self.stdout.write(self.style.SUCCESS(f"Ranked {ranked} trending posts."))
+        if options['schedule'] and schedule_trending() is not None:
+            self.stdout.write("Queued the periodic trending job.")
@@ -0,0 +1,31 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from post.models import Post
+from shared.images import render_variants
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Render missing thumbnails for post images and user photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-render variants that already exist.")
+
+    def handle(self, *args, **options):
+        sizes = tuple(settings.IMAGE_VARIANT_SIZES)
+        names = list(Post.objects.values_list('image', flat=True))
+        names += list(User.objects.exclude(photo='').exclude(photo=None).values_list('photo', flat=True))
+        rendered = 0
+        for name in names:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if not os.path.exists(path):
+                continue
+            try:
+                if render_variants(path, sizes, overwrite=options['force']):
+                    rendered += 1
+            except OSError as e:
+                self.stderr.write(f"{name}: {e}")
+        self.stdout.write(self.style.SUCCESS(f"Rendered variants for {rendered} images."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from post.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute stored like/comment counters on posts and comments, post counters on tags and follow counters on users, from the source tables."
+
+    def handle(self, *args, **options):
+        posts, comments, tags, users = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt counters for {posts} posts, {comments} comments, {tags} tags and {users} users."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from post.search import post_index, comment_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of post captions and comments, e.g. after bulk imports."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            posts = post_index.rebuild()
+            comments = comment_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {posts} posts and {comments} comments."))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from post.similar import update_similar_posts, schedule_similar_posts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the co-like similar posts served by /post/<id>/similar/ from all likes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedule', action='store_true',
+                            help="Also queue the periodic incremental job for the run_jobs worker.")
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        updated = update_similar_posts()
+        self.stdout.write(self.style.SUCCESS(f"Updated similar posts of {updated} posts."))
+        if options['schedule'] and schedule_similar_posts(started) is not None:
+            self.stdout.write("Queued the periodic similar posts job.")
@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:38
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# (model, text column) pairs that get a tsvector column on PostgreSQL.
+SEARCH_DOCUMENTS = [('post', 'caption'), ('postcomment', 'comment')]
+
+# Frozen copy of the tokenizer in post.search as of this migration.
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text):
+    return Counter(token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.casefold()))
+
+
+def add_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    qn = schema_editor.quote_name
+    for model_name, column in SEARCH_DOCUMENTS:
+        table = apps.get_model('post', model_name)._meta.db_table
+        schema_editor.execute(f"ALTER TABLE {qn(table)} ADD COLUMN {qn('search_vector')} tsvector")
+        schema_editor.execute(
+            f"UPDATE {qn(table)} SET {qn('search_vector')} = to_tsvector(%s::regconfig, {qn(column)})",
+            [settings.SEARCH_CONFIG],
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {qn(f'{table}_search_vector_idx')} ON {qn(table)} USING gin ({qn('search_vector')})"
+        )
+
+
+def remove_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    qn = schema_editor.quote_name
+    for model_name, _ in SEARCH_DOCUMENTS:
+        table = apps.get_model('post', model_name)._meta.db_table
+        schema_editor.execute(f"ALTER TABLE {qn(table)} DROP COLUMN {qn('search_vector')}")
+
+
+def index_existing_documents(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    for model_name, column, term_model_name, document in [
+        ('post', 'caption', 'postsearchterm', 'post'),
+        ('postcomment', 'comment', 'commentsearchterm', 'comment'),
+    ]:
+        model = apps.get_model('post', model_name)
+        term_model = apps.get_model('post', term_model_name)
+        terms = []
+        for pk, text in model.objects.values_list('pk', column).iterator(chunk_size=1000):
+            terms.extend(
+                term_model(term=term, frequency=frequency, **{f'{document}_id': pk})
+                for term, frequency in tokenize(text).items()
+            )
+            if len(terms) >= 1000:
+                term_model.objects.bulk_create(terms)
+                terms = []
+        term_model.objects.bulk_create(terms)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0004_timeline_entry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveSmallIntegerField(default=1)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='post.postcomment')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'comment'), name='commentSearchTermUnique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveSmallIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='post.post')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'post'), name='postSearchTermUnique')],
+            },
+        ),
+        migrations.RunPython(add_search_vectors, remove_search_vectors),
+        migrations.RunPython(index_existing_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:39
+
+import re
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+# Frozen copy of the extractor in post.tags as of this migration.
+HASHTAG_RE = re.compile(r'#(\w+)')
+MAX_TAG_LENGTH = 100
+MAX_HASHTAGS = 30
+
+
+def extract_hashtags(text):
+    tags = dict.fromkeys(name.casefold()[:MAX_TAG_LENGTH] for name in HASHTAG_RE.findall(text))
+    return list(tags)[:MAX_HASHTAGS]
+
+
+def tag_existing_posts(apps, schema_editor):
+    Post = apps.get_model('post', 'Post')
+    Tag = apps.get_model('post', 'Tag')
+    TaggedPost = apps.get_model('post', 'TaggedPost')
+    tagged = {}
+    for pk, caption, created_at in Post.objects.values_list('pk', 'caption', 'created_at').iterator(chunk_size=1000):
+        for name in extract_hashtags(caption):
+            tagged.setdefault(name, []).append((pk, created_at))
+    for name, posts in tagged.items():
+        tag = Tag.objects.create(name=name, posts_count=len(posts))
+        TaggedPost.objects.bulk_create(
+            [TaggedPost(tag=tag, post_id=pk, created_at=created_at) for pk, created_at in posts],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['name'], name='tag_name_prefix_idx', opclasses=['varchar_pattern_ops'])],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaggedPost',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tagged_posts', to='post.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tagged_posts', to='post.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', 'created_at', 'post'], name='tagged_post_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tag', 'post'), name='taggedPostUnique')],
+            },
+        ),
+        migrations.RunPython(tag_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:42
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0007_trending_post'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarPost',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('score', models.FloatField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_posts', to='post.post')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='post.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['post', 'score', 'similar'], name='similar_post_score_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'similar'), name='similarPostUnique')],
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+from .cache import get_comment_trees
+from .like_buffer import merge_pending
+from .models import Post, PostComment, PostLike, CommentLike
+
+
+def liked_post_ids(user, posts):
+    if not user.is_authenticated:
+        return set()
+    return merge_pending(Post, user, PostLike.objects.filter(
+        author=user, post_id__in=[post.pk for post in posts]
+    ).values_list('post_id', flat=True))
+
+
+def liked_comment_ids(user, comments):
+    # Keyed by post so that nested replies of the page are covered by the same query.
+    if not user.is_authenticated:
+        return set()
+    return merge_pending(PostComment, user, CommentLike.objects.filter(
+        author=user, comment__post_id__in={comment.post_id for comment in comments}
+    ).values_list('comment_id', flat=True))
+
+
+async def aliked_post_ids(user, posts):
+    if not user.is_authenticated:
+        return set()
+    rows = PostLike.objects.filter(author=user, post_id__in=[post.pk for post in posts]).values_list('post_id', flat=True)
+    return merge_pending(Post, user, [post_id async for post_id in rows])
+
+
+async def aliked_comment_ids(user, post_ids):
+    # Takes post ids rather than comments so it can run while the comments themselves load.
+    if not user.is_authenticated:
+        return set()
+    rows = CommentLike.objects.filter(author=user, comment__post_id__in=post_ids).values_list('comment_id', flat=True)
+    return merge_pending(PostComment, user, [comment_id async for comment_id in rows])
+
+
+class ViewerStateMixin:
+    """
+    Resolves the requesting user's likes for a whole page with a single IN (...) query
+    and hands the result to the serializer through its context.
+    """
+    viewer_state_context_key = None
+    viewer_state_loader = None
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if kwargs.get('many') and args:
+            serializer.context[self.viewer_state_context_key] = self.viewer_state_loader(
+                self.request.user, list(args[0])
+            )
+        return serializer
+
+
+class PostViewerStateMixin(ViewerStateMixin):
+    viewer_state_context_key = 'liked_post_ids'
+    viewer_state_loader = staticmethod(liked_post_ids)
+
+
+class CommentViewerStateMixin(ViewerStateMixin):
+    viewer_state_context_key = 'liked_comment_ids'
+    viewer_state_loader = staticmethod(liked_comment_ids)
+
+
+class CommentTreeMixin:
+    """
+    Loads the (cached) reply trees of every post on the page up front so that
+    CommentSerializer.get_replies renders from memory instead of querying per level.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if kwargs.get('many') and args:
+            serializer.context['comment_children'] = get_comment_trees(
+                {comment.post_id for comment in args[0]}
+            )
+        return serializer
@@ -10,11 +10,17 @@ class Post(BaseModel):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     image = models.ImageField(upload_to='post_images')
     caption = models.TextField(validators=[MaxLengthValidator(1000)])
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         db_table = 'posts'
         verbose_name = 'post'
         verbose_name_plural = 'posts'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='post_created_id_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='post_author_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.author}'s post is {self.caption}"
@@ -26,6 +32,12 @@ class PostComment(BaseModel):
     parent = models.ForeignKey(
         'self', null=True, blank=True, related_name='child', on_delete=models.CASCADE
     )
+    likes_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='comment_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"comment by {self.author}"
@@ -40,6 +52,9 @@ class PostLike(BaseModel):
                              name='postLikeUnique'
                              )
         ]
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='postlike_created_idx'),
+        ]
 
 
 class CommentLike(BaseModel):
@@ -50,4 +65,124 @@ class CommentLike(BaseModel):
         constraints = [
             UniqueConstraint(fields=['author', 'comment'],
                              name='c    ommentLikeUnique')
-        ]
\ No newline at end of file
+        ]
+        indexes = [
+            models.Index(fields=['comment', 'created_at', 'id'], name='commentlike_created_idx'),
+        ]
+
+
+class TimelineEntry(BaseModel):
+    """
+    A post materialized into a follower's home timeline. ``created_at`` is copied
+    from the post so the timeline and pulled posts page on the same key.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['owner', 'post'], name='timelineEntryUnique')
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'post'], name='timeline_owner_created_idx'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """
+    A row of the tokenized search index used when the database has no full-text
+    search of its own: one row per distinct term of a document, with how often
+    it occurs there. See ``post.search``.
+    """
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+
+class PostSearchTerm(SearchTerm):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_terms')
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['term', 'post'], name='postSearchTermUnique')
+        ]
+
+
+class CommentSearchTerm(SearchTerm):
+    comment = models.ForeignKey(PostComment, on_delete=models.CASCADE, related_name='search_terms')
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['term', 'comment'], name='commentSearchTermUnique')
+        ]
+
+
+class Tag(BaseModel):
+    """
+    A normalized hashtag. ``posts_count`` is kept up to date as posts are tagged
+    and untagged, so tag pages and autocomplete never count rows.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    posts_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Lets ``name LIKE 'prefix%'`` use an index on PostgreSQL regardless of the collation.
+            models.Index(fields=['name'], name='tag_name_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class TaggedPost(BaseModel):
+    """
+    A post listed under a tag. ``created_at`` is copied from the post so a tag
+    feed pages on the same ``(created_at, post)`` key as the other feeds.
+    """
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='tagged_posts')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='tagged_posts')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['tag', 'post'], name='taggedPostUnique')
+        ]
+        indexes = [
+            models.Index(fields=['tag', 'created_at', 'post'], name='tagged_post_created_idx'),
+        ]
+
+
+class TrendingPost(BaseModel):
+    """
+    A post in the precomputed trending ranking, replaced wholesale by
+    ``post.trending.compute_trending``.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='trending')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['score', 'post'], name='trending_score_idx'),
+        ]
+
+
+class SimilarPost(BaseModel):
+    """
+    One of the nearest neighbours of ``post`` by cosine similarity of the users
+    who liked them, written by ``post.similar.update_similar_posts``.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='similar_posts')
+    similar = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=['post', 'similar'], name='similarPostUnique')
+        ]
+        indexes = [
+            models.Index(fields=['post', 'score', 'similar'], name='similar_post_score_idx'),
+        ]
@@ -0,0 +1,106 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, FloatField, Sum
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Post, PostComment, PostSearchTerm, CommentSearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = PostSearchTerm._meta.get_field('term').max_length
+
+
+class SearchIndex:
+    """
+    Full-text index over one text field of a model.
+
+    On PostgreSQL the table has a ``search_vector`` tsvector column with a GIN
+    index (added by migration ``0005_search_index``), refreshed by ``update`` and
+    queried with ``websearch_to_tsquery`` and ranked with ``ts_rank``. Other
+    databases get an inverted index table with a row per term and document,
+    where a document matches when it has every term of the query and ranks by
+    how often it uses them.
+    """
+
+    def __init__(self, model, text_field, term_model, document_field):
+        self.model = model
+        self.text_field = text_field
+        self.term_model = term_model
+        self.document = document_field
+
+    @property
+    def native(self):
+        return connection.vendor == 'postgresql'
+
+    def update(self, instance):
+        if self.native:
+            self._update_vectors(f"WHERE {connection.ops.quote_name('id')} = %s", [instance.pk])
+            return
+        self.term_model.objects.filter(**{self.document: instance}).delete()
+        self.term_model.objects.bulk_create(self.terms(instance.pk, getattr(instance, self.text_field)))
+
+    def rebuild(self, batch_size=1000):
+        if self.native:
+            self._update_vectors()
+            return self.model.objects.count()
+        self.term_model.objects.all().delete()
+        indexed, terms = 0, []
+        rows = self.model.objects.values_list('pk', self.text_field).iterator(chunk_size=batch_size)
+        for pk, text in rows:
+            terms.extend(self.terms(pk, text))
+            indexed += 1
+            if len(terms) >= batch_size:
+                self.term_model.objects.bulk_create(terms)
+                terms = []
+        self.term_model.objects.bulk_create(terms)
+        return indexed
+
+    def terms(self, pk, text):
+        return [
+            self.term_model(term=term, frequency=frequency, **{f'{self.document}_id': pk})
+            for term, frequency in tokenize(text).items()
+        ]
+
+    def _update_vectors(self, where='', params=()):
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {qn(self.model._meta.db_table)} "
+                f"SET {qn('search_vector')} = to_tsvector(%s::regconfig, {qn(self.model._meta.get_field(self.text_field).column)}) "
+                f"{where}",
+                [settings.SEARCH_CONFIG, *params],
+            )
+
+    def search(self, queryset, text):
+        """
+        Narrows ``queryset`` to the rows matching ``text`` and annotates them with ``rank``.
+        """
+        if self.native:
+            from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+
+            qn = connection.ops.quote_name
+            vector = RawSQL(f"{qn(self.model._meta.db_table)}.{qn('search_vector')}", [], output_field=SearchVectorField())
+            query = SearchQuery(text, config=settings.SEARCH_CONFIG, search_type='websearch')
+            # ts_rank is a real; as double precision the cursor value compares equal to the row it came from.
+            return queryset.alias(search_vector=vector).filter(search_vector=query).annotate(
+                rank=Cast(SearchRank(vector, query), FloatField())
+            )
+        terms = list(tokenize(text))[:settings.SEARCH_MAX_TERMS]
+        if not terms:
+            return queryset.none()
+        # The unique (term, document) index makes every joined row a distinct term.
+        return queryset.filter(search_terms__term__in=terms).annotate(
+            matched=Count('search_terms'),
+            rank=Sum('search_terms__frequency'),
+        ).filter(matched=len(terms))
+
+
+def tokenize(text):
+    return Counter(token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.casefold()))
+
+
+post_index = SearchIndex(Post, 'caption', PostSearchTerm, 'post')
+comment_index = SearchIndex(PostComment, 'comment', CommentSearchTerm, 'comment')
@@ -1,13 +1,20 @@
 from rest_framework import serializers
 
-from post.models import Post, PostLike, PostComment, CommentLike
+from post.like_buffer import pending_intents
+from post.models import Post, PostLike, PostComment, CommentLike, Tag
+from shared.images import variant_urls
 from users.models import User
 
 
 class UserSerializer(serializers.ModelSerializer):
+    photo_variants = serializers.SerializerMethodField('get_photo_variants')
+
     class Meta:
         model = User
-        fields = ('id', 'username', 'photo')
+        fields = ('id', 'username', 'photo', 'photo_variants')
+
+    def get_photo_variants(self, obj):
+        return variant_urls(obj.photo, self.context.get('request'))
 
 
 class PostSerializer(serializers.ModelSerializer):
@@ -16,26 +23,32 @@ class PostSerializer(serializers.ModelSerializer):
     post_likes_count = serializers.SerializerMethodField('get_post_likes_count')
     post_comments_count = serializers.SerializerMethodField('get_post_comments_count')
     me_liked = serializers.SerializerMethodField('get_me_liked')
+    image_variants = serializers.SerializerMethodField('get_image_variants')
 
     class Meta:
         model = Post
-        fields = ('id', 'author', 'image', 'caption', 'created_at', 'post_likes_count', 'post_comments_count', 'me_liked')
+        fields = ('id', 'author', 'image', 'image_variants', 'caption', 'created_at', 'post_likes_count', 'post_comments_count', 'me_liked')
         extra_kwargs = {"image": {"required": False}}
 
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, self.context.get('request'))
+
     def get_post_likes_count(self, obj):
-        return obj.likes.count()
+        return obj.likes_count
 
     def get_post_comments_count(self, obj):
-        return obj.comments.count()
+        return obj.comments_count
 
     def get_me_liked(self, obj):
+        liked_post_ids = self.context.get('liked_post_ids')
+        if liked_post_ids is not None:
+            return obj.pk in liked_post_ids
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
-            try:
-                like = PostLike.objects.get(post=obj, author=request.user)
-                return True
-            except PostLike.DoesNotExist:
-                return False
+            liked = pending_intents(Post, request.user).get(obj.pk)
+            if liked is not None:
+                return liked
+            return PostLike.objects.filter(post=obj, author=request.user).exists()
         return False
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -50,6 +63,12 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ('id', 'author', 'comment', 'post', 'created_at','parent','replies','likes_count','me_liked')
 
     def get_replies(self, obj):
+        comment_children = self.context.get('comment_children')
+        if comment_children is not None:
+            replies = comment_children.get(obj.pk)
+            if replies:
+                return self.__class__(replies, many=True, context=self.context).data
+            return None
         if obj.child.exists():
 
             serializers = self.__class__(obj.child.all(), many=True, context=self.context)
@@ -59,14 +78,20 @@ class CommentSerializer(serializers.ModelSerializer):
             return None
 
     def get_me_liked(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return obj.likes.filter(author=user).exists()
+        liked_comment_ids = self.context.get('liked_comment_ids')
+        if liked_comment_ids is not None:
+            return obj.pk in liked_comment_ids
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            liked = pending_intents(PostComment, request.user).get(obj.pk)
+            if liked is not None:
+                return liked
+            return obj.likes.filter(author=request.user).exists()
         else:
             return False
     @staticmethod
     def get_likes_count( obj):
-        return obj.likes.count()
+        return obj.likes_count
 
 
 class CommentLikeSerializer(serializers.ModelSerializer):
@@ -79,6 +104,11 @@ class CommentLikeSerializer(serializers.ModelSerializer):
 
 
 
+class LikeStateSerializer(serializers.Serializer):
+    liked = serializers.BooleanField(required=False, allow_null=True, default=None,
+                                     help_text="Desired state; leave it out to toggle.")
+
+
 class PostLikeSerializer(serializers.ModelSerializer):
 
     id = serializers.UUIDField(read_only=True)
@@ -88,3 +118,9 @@ class PostLikeSerializer(serializers.ModelSerializer):
         model = PostLike
         fields = ('id', 'author','post')
 
+
+class TagSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Tag
+        fields = ('name', 'posts_count')
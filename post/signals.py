@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from shared.storage import release_files, replaced_files, stored_files
+from .cache import invalidate_post_detail, invalidate_comment_tree
+from .models import Post, PostLike, PostComment, CommentLike
+from .search import post_index, comment_index
+from .tags import sync_post_tags, release_post_tags
+
+
+# Counters are bumped after the row is written, so invalidation waits until the transaction is done.
+
+@receiver(post_save, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_post_detail(instance.pk))
+
+
+@receiver(post_delete, sender=Post)
+def invalidate_deleted_post(sender, instance, **kwargs):
+    # Read the pk now: the collector clears it on the instance before the transaction commits.
+    post_id = instance.pk
+
+    def invalidate():
+        invalidate_post_detail(post_id, deleted=True)
+        invalidate_comment_tree(post_id, deleted=True)
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    # Index rows go away with the document through the foreign key cascade.
+    if update_fields is None or 'caption' in update_fields:
+        post_index.update(instance)
+
+
+@receiver(post_save, sender=Post)
+def tag_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'caption' in update_fields:
+        sync_post_tags(instance)
+
+
+@receiver(pre_delete, sender=Post)
+def untag_post(sender, instance, **kwargs):
+    release_post_tags(instance)
+
+
+@receiver(post_save, sender=PostComment)
+def index_comment(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'comment' in update_fields:
+        comment_index.update(instance)
+
+
+@receiver(pre_save, sender=Post)
+def find_replaced_image(sender, instance, update_fields=None, **kwargs):
+    instance._replaced_files = replaced_files(instance, update_fields)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    release_files(instance.__dict__.pop('_replaced_files', []))
+
+
+@receiver(post_delete, sender=Post)
+def release_post_image(sender, instance, **kwargs):
+    release_files(stored_files(instance))
+
+
+@receiver([post_save, post_delete], sender=PostLike)
+def invalidate_post_likes(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_post_detail(instance.post_id))
+
+
+@receiver([post_save, post_delete], sender=PostComment)
+def invalidate_post_comments(sender, instance, **kwargs):
+    def invalidate():
+        invalidate_post_detail(instance.post_id)
+        invalidate_comment_tree(instance.post_id)
+    transaction.on_commit(invalidate)
+
+
+@receiver([post_save, post_delete], sender=CommentLike)
+def invalidate_comment_likes(sender, instance, **kwargs):
+    post_id = PostComment.objects.filter(pk=instance.comment_id).values_list('post_id', flat=True).first()
+    if post_id is not None:
+        transaction.on_commit(lambda: invalidate_comment_tree(post_id))
@@ -0,0 +1,117 @@
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from scipy import sparse
+
+from shared.jobs import ensure_scheduled
+from .models import PostLike, SimilarPost
+
+logger = logging.getLogger(__name__)
+
+
+class LikeMatrix:
+    """
+    The user x post like matrix, with the row and column of every user and post
+    that has at least one like. Values are 1.0; a column's norm is the square
+    root of the post's like count.
+    """
+
+    def __init__(self):
+        users, posts, user_rows, post_columns = {}, [], [], []
+        column_of = {}
+        likes = PostLike.objects.values_list('author_id', 'post_id').iterator(chunk_size=10000)
+        for user_id, post_id in likes:
+            user_rows.append(users.setdefault(user_id, len(users)))
+            column = column_of.get(post_id)
+            if column is None:
+                column = column_of[post_id] = len(posts)
+                posts.append(post_id)
+            post_columns.append(column)
+
+        self.post_ids = posts
+        self.column_of = column_of
+        self.likes = sparse.csr_matrix(
+            (np.ones(len(user_rows), dtype=np.float32), (user_rows, post_columns)),
+            shape=(len(users), len(posts)),
+        )
+        self.likers = self.likes.T.tocsr()
+        self.norms = np.sqrt(np.asarray(self.likes.sum(axis=0)).ravel())
+
+    def columns(self, post_ids):
+        return np.array(sorted({self.column_of[post_id] for post_id in post_ids if post_id in self.column_of}), dtype=np.int64)
+
+    def co_liked(self, columns):
+        # Every post sharing a liker with one of ``columns``: the ones whose neighbours may have changed.
+        users = np.unique(self.likers[columns].indices)
+        return np.union1d(columns, np.unique(self.likes[users].indices))
+
+    def neighbours(self, columns, size, min_co_likes):
+        """
+        Yields ``(post_id, [(similar_post_id, score), ...])`` for the given columns,
+        best first. Only one ``len(columns) x posts`` sparse product is held at a time.
+        """
+        co_likes = (self.likers[columns] @ self.likes).tocsr()
+        co_likes.data[co_likes.data < min_co_likes] = 0
+        co_likes.eliminate_zeros()
+        norms = self.norms.astype(np.float64)
+        scores = (sparse.diags(1 / norms[columns]) @ co_likes @ sparse.diags(1 / norms)).tocsr()
+        for row, column in enumerate(columns):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            others, values = scores.indices[start:end], scores.data[start:end]
+            keep = others != column
+            others, values = others[keep], values[keep]
+            if len(values) > size:
+                best = np.argpartition(values, -size)[-size:]
+                others, values = others[best], values[best]
+            order = np.argsort(-values, kind='stable')
+            yield self.post_ids[column], [(self.post_ids[other], float(value)) for other, value in zip(others[order], values[order])]
+
+
+def update_similar_posts(since=None):
+    """
+    Recomputes the stored neighbours of posts from the like matrix. With
+    ``since``, only posts liked after it and the posts sharing a liker with them
+    are recomputed; without it, everything is. Unlikes are only reflected by a
+    full run. Returns the number of posts whose neighbours were rewritten.
+    """
+    matrix = LikeMatrix()
+    if since is None:
+        columns = np.arange(len(matrix.post_ids))
+        SimilarPost.objects.filter(~Exists(PostLike.objects.filter(post_id=OuterRef('post_id')))).delete()
+    else:
+        liked = PostLike.objects.filter(created_at__gte=since).values_list('post_id', flat=True).distinct()
+        columns = matrix.columns(liked)
+        if len(columns):
+            columns = matrix.co_liked(columns)
+
+    chunk_size = settings.SIMILAR_POSTS_CHUNK_SIZE
+    for start in range(0, len(columns), chunk_size):
+        neighbours = matrix.neighbours(
+            columns[start:start + chunk_size], settings.SIMILAR_POSTS_SIZE, settings.SIMILAR_POSTS_MIN_CO_LIKES
+        )
+        rows, post_ids = [], []
+        for post_id, similar in neighbours:
+            post_ids.append(post_id)
+            rows.extend(SimilarPost(post_id=post_id, similar_id=similar_id, score=score) for similar_id, score in similar)
+        with transaction.atomic():
+            SimilarPost.objects.filter(post_id__in=post_ids).delete()
+            SimilarPost.objects.bulk_create(rows)
+    return len(columns)
+
+
+def run_similar_posts(since=None):
+    # Periodic job: catches up with the likes since the previous run, then queues the next one from here.
+    started = timezone.now()
+    updated = update_similar_posts(parse_datetime(since) if since else None)
+    logger.info("Updated similar posts of %s posts", updated)
+    schedule_similar_posts(started)
+
+
+def schedule_similar_posts(since):
+    # Makes sure one incremental run_similar_posts job is queued for the run_jobs worker.
+    return ensure_scheduled(run_similar_posts, settings.SIMILAR_POSTS_INTERVAL, since=since.isoformat())
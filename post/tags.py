@@ -0,0 +1,118 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from shared.custom_pagination import KeysetPagination
+from .models import Post, Tag, TaggedPost
+
+HASHTAG_RE = re.compile(r'#(\w+)')
+MAX_TAG_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def normalize_tag(name):
+    return name.lstrip('#').casefold()[:MAX_TAG_LENGTH]
+
+
+def extract_hashtags(text):
+    """
+    Returns the distinct normalized hashtags of ``text`` in order of appearance,
+    at most ``POST_MAX_HASHTAGS`` of them.
+    """
+    tags = dict.fromkeys(normalize_tag(name) for name in HASHTAG_RE.findall(text))
+    return list(tags)[:settings.POST_MAX_HASHTAGS]
+
+
+def _adjust_tag_counters(tag_ids, delta):
+    if tag_ids:
+        Tag.objects.filter(pk__in=tag_ids).update(posts_count=Greatest(F('posts_count') + delta, 0))
+
+
+def _current_tags(post):
+    return dict(TaggedPost.objects.filter(post=post).values_list('tag__name', 'tag_id'))
+
+
+def sync_post_tags(post):
+    """
+    Brings the tags of ``post`` in line with its caption, touching only the tags
+    that were added or removed. Counters move only for the join rows this call
+    actually inserted or deleted, so concurrent saves of the same post cannot
+    count a tag twice.
+    """
+    names = set(extract_hashtags(post.caption))
+    current = _current_tags(post)
+
+    removed = [tag_id for name, tag_id in current.items() if name not in names]
+    if removed:
+        _adjust_tag_counters(_untag_post(post, removed), -1)
+
+    added = names - current.keys()
+    if added:
+        # ``ignore_conflicts`` lets a concurrent post introduce the same tag; the ids are read back afterwards.
+        Tag.objects.bulk_create([Tag(name=name) for name in added], ignore_conflicts=True)
+        tag_ids = list(Tag.objects.filter(name__in=added).values_list('pk', flat=True))
+        _adjust_tag_counters(_tag_post(post, tag_ids), 1)
+
+
+def release_post_tags(post):
+    # Deleting the join rows here rather than through the cascade tells exactly which counters to take back.
+    _adjust_tag_counters(_untag_post(post), -1)
+
+
+def _tag_post(post, tag_ids):
+    """
+    Inserts the join rows that do not exist yet and returns the ids of the tags they were inserted for.
+    """
+    rows = [TaggedPost(tag_id=tag_id, post=post, created_at=post.created_at) for tag_id in tag_ids]
+    fields = TaggedPost._meta.concrete_fields
+    qn = connection.ops.quote_name
+    placeholders = f"({', '.join(['%s'] * len(fields))})"
+    sql = (
+        f"INSERT INTO {qn(TaggedPost._meta.db_table)} ({', '.join(qn(field.column) for field in fields)}) "
+        f"VALUES {', '.join([placeholders] * len(rows))} "
+        f"ON CONFLICT ({qn(TaggedPost._meta.get_field('tag').column)}, {qn(TaggedPost._meta.get_field('post').column)}) "
+        f"DO NOTHING RETURNING {qn(TaggedPost._meta.get_field('tag').column)}"
+    )
+    params = [field.get_db_prep_save(field.pre_save(row, add=True), connection) for row in rows for field in fields]
+    return _fetch_tag_ids(sql, params)
+
+
+def _untag_post(post, tag_ids=None):
+    """
+    Deletes the join rows of ``post`` (only those for ``tag_ids`` when given) and
+    returns the ids of the tags they were deleted for.
+    """
+    qn = connection.ops.quote_name
+    tag_column = qn(TaggedPost._meta.get_field('tag').column)
+    sql = (
+        f"DELETE FROM {qn(TaggedPost._meta.db_table)} "
+        f"WHERE {qn(TaggedPost._meta.get_field('post').column)} = %s"
+    )
+    params = [Post._meta.pk.get_db_prep_value(post.pk, connection)]
+    if tag_ids is not None:
+        sql += f" AND {tag_column} IN ({', '.join(['%s'] * len(tag_ids))})"
+        params += [Tag._meta.pk.get_db_prep_value(tag_id, connection) for tag_id in tag_ids]
+    return _fetch_tag_ids(f"{sql} RETURNING {tag_column}", params)
+
+
+def _fetch_tag_ids(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [Tag._meta.pk.to_python(row[0]) for row in cursor.fetchall()]
+
+
+def autocomplete_tags(prefix, limit):
+    return Tag.objects.filter(name__startswith=normalize_tag(prefix), posts_count__gt=0).order_by('-posts_count', 'name')[:limit]
+
+
+class TagFeedPagination(KeysetPagination):
+    """
+    Pages the ``TaggedPost`` rows of one tag on ``(created_at, post)`` and returns their posts.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.start_page(queryset, request):
+            return None
+        return self.finish_page([entry.post for entry in self.keyset_slice(queryset, 'created_at', 'post_id')])
@@ -1,3 +1,546 @@
-from django.test import TestCase
+import json
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from post.like_buffer import LikeBuffer, like_buffer
+from post.counters import rebuild_counters
+from post.likes import comment_likes, post_likes
+from post import tags
+from post.models import CommentLike, Post, PostComment, PostLike, SimilarPost, Tag, TaggedPost, TimelineEntry
+from post.similar import update_similar_posts
+from post.timeline import fan_out_post
+from post.trending import compute_trending, schedule_trending
+from shared.models import Job
+from users.models import User, UserFollow, DONE
+
+
+class PostTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.create_user('alice')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create(username=username, email=f"{username}@example.com", AUTH_STATUS=DONE)
+
+    def create_post(self, caption='caption', author=None):
+        return Post.objects.create(author=author or self.user, image='post_images/test.jpg', caption=caption)
+
+    def collect_pages(self, url):
+        # Follows ``next`` links to the end and returns the ids of every result, in order.
+        ids = []
+        while url:
+            data = self.client.get(url).data
+            ids += [item['id'] for item in data['results']]
+            url = data['next']
+        return ids
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, len(queries)
+
+
+class CounterTests(PostTestCase):
+
+    def test_like_and_comment_counters_follow_writes(self):
+        post = self.create_post()
+        others = [self.create_user(f'user{i}') for i in range(3)]
+        for user in [self.user] + others:
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.post(f'/post/{post.pk}/create-delete-like/').status_code, 201)
+        self.assertEqual(self.client.post(f'/post/{post.pk}/create-delete-like/').status_code, 200)
+        self.client.delete(f'/post/{post.pk}/create-delete-like/')
+        self.client.delete(f'/post/{post.pk}/create-delete-like/')
+        response = self.client.post(f'/post/{post.pk}/comments/create/', {'comment': 'nice', 'post': str(post.pk)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        comment_id = response.data['id']
+        self.client.post(f'/post/comments/{comment_id}/create-delete-like/')
+
+        post.refresh_from_db()
+        self.assertEqual((post.likes_count, post.comments_count), (3, 1))
+        self.assertEqual(PostComment.objects.get(pk=comment_id).likes_count, 1)
+        data = self.client.get(f'/post/{post.pk}/').data
+        self.assertEqual((data['post_likes_count'], data['post_comments_count']), (3, 1))
+
+    def test_counters_never_go_below_zero(self):
+        post = self.create_post()
+        comment = PostComment.objects.create(author=self.user, post=post, comment='nice')
+        self.assertFalse(post_likes.unlike(self.user, post.pk))
+        self.assertFalse(comment_likes.unlike(self.user, comment.pk))
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual((post.likes_count, comment.likes_count), (0, 0))
+
+    def test_rebuild_repairs_drift(self):
+        post = self.create_post()
+        comment = PostComment.objects.create(author=self.user, post=post, comment='nice')
+        PostLike.objects.bulk_create([PostLike(author=self.user, post=post)])
+        CommentLike.objects.bulk_create([CommentLike(author=self.user, comment=comment)])
+        Post.objects.filter(pk=post.pk).update(likes_count=7)
+        rebuild_counters()
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual((post.likes_count, post.comments_count, comment.likes_count), (1, 1, 1))
+
+    def test_rebuild_restores_follow_counters_after_user_deletion(self):
+        bob, carol = self.create_user('bob'), self.create_user('carol')
+        for follower, following in ((bob, self.user), (carol, self.user), (self.user, bob)):
+            UserFollow.objects.create(follower=follower, following=following)
+        User.objects.filter(pk=self.user.pk).update(followers_count=2, following_count=1)
+        User.objects.filter(pk=bob.pk).update(followers_count=1, following_count=1)
+        carol.delete()
+        rebuild_counters()
+        self.user.refresh_from_db()
+        bob.refresh_from_db()
+        self.assertEqual((self.user.followers_count, self.user.following_count), (1, 1))
+        self.assertEqual((bob.followers_count, bob.following_count), (1, 1))
+
+
+class ViewerStateTests(PostTestCase):
+
+    def test_me_liked_takes_the_same_queries_for_any_page_size(self):
+        posts = [self.create_post() for _ in range(10)]
+        for post in posts[::2]:
+            post_likes.like(self.user, post.pk)
+        response, small = self.count_queries('/post/list/?page_size=2')
+        response, large = self.count_queries('/post/list/?page_size=10')
+        self.assertEqual(small, large)
+        liked = {str(post.pk) for post in posts[::2]}
+        self.assertEqual({post['id'] for post in response.data['results'] if post['me_liked']}, liked)
+
+
+class CommentTreeTests(PostTestCase):
+
+    def test_tree_is_loaded_with_a_fixed_number_of_queries(self):
+        post = self.create_post()
+        root = PostComment.objects.create(author=self.user, post=post, comment='root')
+        reply = PostComment.objects.create(author=self.user, post=post, comment='reply', parent=root)
+        comment_likes.like(self.user, reply.pk)
+        _, shallow = self.count_queries(f'/post/{post.pk}/comments/')
+        cache.clear()
+        parent = reply
+        for depth in range(5):
+            parent = PostComment.objects.create(author=self.user, post=post, comment=f'deeper {depth}', parent=parent)
+        PostComment.objects.create(author=self.user, post=post, comment='second root')
+        response, deep = self.count_queries(f'/post/{post.pk}/comments/')
+        self.assertEqual(shallow, deep)
+        replies = response.data[0]['replies'] if response.data[0]['id'] == str(root.pk) else response.data[1]['replies']
+        self.assertEqual(replies[0]['id'], str(reply.pk))
+        self.assertTrue(replies[0]['me_liked'])
+        self.assertEqual(replies[0]['likes_count'], 1)
+
+
+class KeysetPaginationTests(PostTestCase):
+
+    def page(self, url):
+        data = self.client.get(url).data
+        return [post['id'] for post in data['results']], data['next'], data['previous']
+
+    def test_pages_through_equal_timestamps_without_gaps(self):
+        posts = [self.create_post() for _ in range(7)]
+        Post.objects.update(created_at=posts[0].created_at)
+        expected = sorted((str(post.pk) for post in posts), key=uuid.UUID, reverse=True)
+        self.assertEqual(self.collect_pages('/post/list/?page_size=3'), expected)
+
+    def test_new_posts_do_not_shift_later_pages(self):
+        posts = [self.create_post() for _ in range(4)]
+        first, next_url, _ = self.page('/post/list/?page_size=2')
+        self.create_post()
+        second, next_url, previous_url = self.page(next_url)
+        self.assertEqual(first + second, [str(post.pk) for post in reversed(posts)])
+        self.assertIsNone(next_url)
+        # Going back returns the same first page, now with the newer post before it.
+        back, _, previous_url = self.page(previous_url)
+        self.assertEqual(back, first)
+        self.assertIsNotNone(previous_url)
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get('/post/list/?cursor=bm9wZQ').status_code, 404)
+
+    def test_count_is_only_given_on_request(self):
+        self.create_post()
+        self.assertNotIn('count', self.client.get('/post/list/').data)
+        self.assertIsInstance(self.client.get('/post/list/?count=true').data['count'], int)
+
+
+class TimelineTests(PostTestCase):
+
+    def publish(self, author, caption='caption'):
+        post = self.create_post(caption, author=author)
+        fan_out_post(post)
+        return post
+
+    def timeline(self, page_size=2):
+        return self.collect_pages(f'/post/timeline/?page_size={page_size}')
+
+    def follow(self, user):
+        return self.client.post(f'/users/{user.pk}/follow/')
+
+    @override_settings(TIMELINE_FANOUT_BATCH_SIZE=2)
+    def test_new_posts_reach_every_follower(self):
+        author = self.create_user('bobby')
+        followers = [self.create_user(f'user{i}') for i in range(5)]
+        for follower in followers:
+            self.client.force_authenticate(follower)
+            self.assertEqual(self.follow(author).status_code, 201)
+        post = self.publish(author)
+        self.assertEqual(
+            set(TimelineEntry.objects.filter(post=post).values_list('owner_id', flat=True)),
+            {author.pk} | {follower.pk for follower in followers},
+        )
+        # A retried fan-out does not duplicate entries.
+        fan_out_post(post)
+        self.assertEqual(TimelineEntry.objects.filter(post=post).count(), 6)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        author = self.create_user('bobby')
+        old = [self.publish(author) for _ in range(3)]
+        self.assertEqual(self.follow(author).status_code, 201)
+        self.assertEqual(self.follow(author).status_code, 400)
+        self.assertEqual(self.timeline(), [str(post.pk) for post in reversed(old)])
+        self.assertEqual(self.client.delete(f'/users/{author.pk}/follow/').status_code, 204)
+        self.assertEqual(self.timeline(), [])
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 0)
+
+    @override_settings(TIMELINE_CELEBRITY_FOLLOWERS=1)
+    def test_celebrity_posts_are_pulled_and_merged(self):
+        friend, celebrity = self.create_user('bobby'), self.create_user('carol')
+        self.follow(celebrity)
+        celebrity.refresh_from_db()
+        # Following without the counter keeps the friend below the celebrity threshold.
+        UserFollow.objects.create(follower=self.user, following=friend)
+        posts = [self.publish(author) for author in (friend, celebrity, self.user, celebrity, friend)]
+        self.assertFalse(TimelineEntry.objects.filter(post__author=celebrity, owner=self.user).exists())
+        self.assertEqual(self.timeline(), [str(post.pk) for post in reversed(posts)])
+
+
+class PostDetailCacheTests(PostTestCase):
+
+    def detail(self, post):
+        return self.client.get(f'/post/{post.pk}/')
+
+    def test_detail_is_cached_until_the_post_changes(self):
+        post = self.create_post('first')
+        self.assertEqual(self.detail(post).data['caption'], 'first')
+        Post.objects.filter(pk=post.pk).update(caption='behind the cache')
+        self.assertEqual(self.detail(post).data['caption'], 'first')
+        post.caption = 'second'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(self.detail(post).data['caption'], 'second')
+
+    def test_likes_and_comments_invalidate_the_detail(self):
+        post = self.create_post()
+        self.detail(post)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/post/{post.pk}/create-delete-like/')
+        data = self.detail(post).data
+        self.assertEqual((data['post_likes_count'], data['me_liked']), (1, True))
+        self.assertEqual(self.client.get(f'/post/{post.pk}/comments/').data, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/post/{post.pk}/comments/create/', {'comment': 'nice', 'post': str(post.pk)}, format='json')
+        self.assertEqual(self.detail(post).data['post_comments_count'], 1)
+        self.assertEqual(len(self.client.get(f'/post/{post.pk}/comments/').data), 1)
+
+    def test_deleted_post_is_not_served_from_cache(self):
+        post = self.create_post()
+        self.detail(post)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/post/{post.pk}/')
+        self.assertEqual(self.detail(post).status_code, 404)
+
+
+class AsyncViewTests(PostTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # The async views run the authentication classes themselves, so the client sends a real token.
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.user.token()['access']}")
+        self.post = self.create_post('first')
+        self.create_post('second')
+        PostLike.objects.create(author=self.user, post=self.post)
+        root = PostComment.objects.create(author=self.user, post=self.post, comment='root')
+        reply = PostComment.objects.create(author=self.user, post=self.post, comment='reply', parent=root)
+        CommentLike.objects.create(author=self.user, comment=reply)
+
+    def assertSamePayload(self, path, query=''):
+        sync = self.client.get(f'/post/{path}{query}')
+        native = self.client.get(f'/post/async/{path}{query}')
+        self.assertEqual((sync.status_code, native.status_code), (200, 200))
+        self.assertEqual(json.loads(native.content.decode().replace('/post/async/', '/post/')), sync.json())
+        return sync.json()
+
+    def test_list_matches_the_sync_view(self):
+        first = self.assertSamePayload('list/', '?page_size=1&count=true')
+        self.assertIsNotNone(first['next'])
+        self.assertSamePayload('list/', '?' + first['next'].split('?', 1)[1])
+
+    def test_detail_matches_the_sync_view(self):
+        data = self.assertSamePayload(f'{self.post.pk}/')
+        self.assertTrue(data['me_liked'])
+
+    def test_comments_match_the_sync_view(self):
+        data = self.assertSamePayload(f'{self.post.pk}/comments/')
+        self.assertEqual(len(data), 1)
+        self.assertTrue(data[0]['replies'][0]['me_liked'])
+
+    def test_missing_post_and_bad_cursor_are_not_found(self):
+        missing = uuid.uuid4()
+        for path in (f'{missing}/', f'{missing}/comments/', 'list/?cursor=bogus'):
+            self.assertEqual(self.client.get(f'/post/{path}').status_code, 404, path)
+            self.assertEqual(self.client.get(f'/post/async/{path}').status_code, 404, path)
+
+
+class LikeTests(PostTestCase):
+
+    def test_toggle_flips_state_and_counter(self):
+        post = self.create_post()
+        self.assertIs(post_likes.toggle(self.user, post.pk), True)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+        self.assertIs(post_likes.toggle(self.user, post.pk), False)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 0)
+        self.assertFalse(PostLike.objects.exists())
+
+    def test_toggle_is_one_statement_on_postgresql(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest("single-statement toggle is PostgreSQL only")
+        post = self.create_post()
+        for target_id in (post.pk, post.pk, uuid.uuid4()):
+            with CaptureQueriesContext(connection) as queries:
+                post_likes.toggle(self.user, target_id)
+            self.assertEqual(len(queries), 1)
+
+    def test_toggle_missing_target(self):
+        self.assertIsNone(post_likes.toggle(self.user, uuid.uuid4()))
+        response = self.client.put(f'/post/{uuid.uuid4()}/like/', {}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_set_is_idempotent(self):
+        post = self.create_post()
+        other = self.create_user('bobby')
+        self.assertTrue(post_likes.set(self.user, post.pk, True))
+        self.assertFalse(post_likes.set(self.user, post.pk, True))
+        self.assertTrue(post_likes.set(other, post.pk, True))
+        self.assertTrue(post_likes.set(other, post.pk, False))
+        self.assertFalse(post_likes.set(other, post.pk, False))
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+
+
+@override_settings(LIKE_WRITE_BEHIND=True)
+class LikeWriteBehindTests(PostTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Flushes are driven by the tests rather than the background thread.
+        patcher = mock.patch.object(LikeBuffer, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(like_buffer.flush)
+
+    def test_liking_missing_post_is_404_and_queues_nothing(self):
+        response = self.client.post(f'/post/{uuid.uuid4()}/create-delete-like/')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.put(f'/post/{uuid.uuid4()}/like/', {'liked': True}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertIsNone(cache.get(f"like-intents:{self.user.pk}"))
+        self.assertEqual(like_buffer.flush(), 0)
+
+    def test_buffered_like_is_visible_and_flushed_once(self):
+        post = self.create_post()
+        self.assertEqual(self.client.post(f'/post/{post.pk}/create-delete-like/').status_code, 202)
+        self.assertEqual(self.client.post(f'/post/{post.pk}/create-delete-like/').status_code, 200)
+        self.assertTrue(self.client.get(f'/post/{post.pk}/').data['me_liked'])
+        self.assertFalse(PostLike.objects.exists())
+
+        self.assertEqual(like_buffer.flush(), 1)
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 1)
+        self.assertTrue(PostLike.objects.filter(post=post, author=self.user).exists())
+
+    def test_like_then_unlike_before_flush_writes_nothing(self):
+        post = self.create_post()
+        self.client.post(f'/post/{post.pk}/create-delete-like/')
+        self.client.delete(f'/post/{post.pk}/create-delete-like/')
+        like_buffer.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, 0)
+        self.assertFalse(PostLike.objects.exists())
+
+
+class SearchTests(PostTestCase):
+
+    def test_results_are_ranked_and_page_through_ties(self):
+        frequent = [self.create_post('sunset sunset at the beach') for _ in range(3)]
+        others = [self.create_post(f'a sunset, take {i}') for i in range(6)]
+        self.create_post('morning coffee')
+        ids = self.collect_pages('/post/search/?q=sunset&page_size=4')
+        self.assertEqual(len(ids), 9)
+        self.assertEqual(len(set(ids)), 9)
+        self.assertEqual(set(ids[:3]), {str(post.pk) for post in frequent})
+        self.assertEqual(set(ids[3:]), {str(post.pk) for post in others})
+
+    def test_index_follows_edits_and_deletes(self):
+        post = self.create_post('morning coffee')
+        post.caption = 'evening tea'
+        post.save()
+        self.assertEqual(self.collect_pages('/post/search/?q=coffee'), [])
+        self.assertEqual(self.collect_pages('/post/search/?q=tea'), [str(post.pk)])
+        post.delete()
+        self.assertEqual(self.collect_pages('/post/search/?q=tea'), [])
+
+    def test_query_is_required(self):
+        self.assertEqual(self.client.get('/post/search/').status_code, 400)
+
+
+class TagTests(PostTestCase):
+
+    def counts(self):
+        return dict(Tag.objects.values_list('name', 'posts_count'))
+
+    def test_counts_follow_edits_and_deletes(self):
+        post = self.create_post('#Sunset at the #beach')
+        self.create_post('another #sunset')
+        self.assertEqual(self.counts(), {'sunset': 2, 'beach': 1})
+        post.save()
+        self.assertEqual(self.counts(), {'sunset': 2, 'beach': 1})
+        post.caption = '#beach #coffee'
+        post.save()
+        self.assertEqual(self.counts(), {'sunset': 1, 'beach': 1, 'coffee': 1})
+        post.delete()
+        self.assertEqual(self.counts(), {'sunset': 1, 'beach': 0, 'coffee': 0})
+        self.assertEqual(TaggedPost.objects.count(), 1)
+
+    def test_stale_diff_does_not_count_twice(self):
+        # A concurrent save of the same post read the tags before this one wrote them.
+        post = self.create_post('#sunset')
+        post.caption = '#beach'
+        with mock.patch.object(tags, '_current_tags', return_value={'sunset': Tag.objects.get(name='sunset').pk}):
+            post.save()
+        post.caption = '#beach'
+        with mock.patch.object(tags, '_current_tags', return_value={}):
+            post.save()
+        with mock.patch.object(tags, '_current_tags', return_value={'sunset': Tag.objects.get(name='sunset').pk}):
+            post.save()
+        self.assertEqual(self.counts(), {'sunset': 0, 'beach': 1})
+        self.assertEqual(TaggedPost.objects.filter(post=post).count(), 1)
+
+    def test_tag_feed_pages_newest_first(self):
+        posts = [self.create_post(f'#sunset take {i}') for i in range(5)]
+        self.create_post('#beach')
+        self.assertEqual(self.client.get('/post/tags/Sunset/').data['tag']['posts_count'], 5)
+        ids = self.collect_pages('/post/tags/Sunset/?page_size=2')
+        self.assertEqual(ids, [str(post.pk) for post in reversed(posts)])
+        self.assertEqual(self.client.get('/post/tags/missing/').status_code, 404)
+
+
+@override_settings(TRENDING_WINDOW_HOURS=72, TRENDING_HALF_LIFE_HOURS=12.0, TRENDING_COMMENT_WEIGHT=2.0)
+class TrendingTests(PostTestCase):
+
+    def create_scored_post(self, hours_ago, likes=0, comments=0):
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(
+            created_at=timezone.now() - timedelta(hours=hours_ago), likes_count=likes, comments_count=comments
+        )
+        return post
+
+    def trending(self, page_size=10):
+        return self.collect_pages(f'/post/trending/?page_size={page_size}')
+
+    def test_ranks_by_decayed_engagement(self):
+        fresh = self.create_scored_post(0, likes=3)
+        older = self.create_scored_post(24, likes=10)
+        commented = self.create_scored_post(0, comments=1)
+        self.create_scored_post(100, likes=1000)
+        self.create_scored_post(0)
+        self.assertEqual(compute_trending(), 3)
+        self.assertEqual(self.trending(page_size=2), [str(post.pk) for post in (fresh, older, commented)])
+
+    def test_keeps_the_best_and_replaces_the_previous_ranking(self):
+        posts = [self.create_scored_post(0, likes=likes) for likes in (1, 5, 3)]
+        with override_settings(TRENDING_SIZE=2):
+            compute_trending()
+        self.assertEqual(self.trending(), [str(posts[1].pk), str(posts[2].pk)])
+        Post.objects.filter(pk=posts[0].pk).update(likes_count=9)
+        with override_settings(TRENDING_SIZE=2):
+            compute_trending()
+        self.assertEqual(self.trending(), [str(posts[0].pk), str(posts[1].pk)])
+
+    def test_equal_scores_page_without_repeats(self):
+        posts = [self.create_scored_post(0, likes=2) for _ in range(5)]
+        Post.objects.update(created_at=timezone.now())
+        compute_trending()
+        self.assertEqual(sorted(self.trending(page_size=2)), sorted(str(post.pk) for post in posts))
+
+    @override_settings(JOB_QUEUE_EAGER=False)
+    def test_schedules_one_run_at_a_time(self):
+        self.assertIsNotNone(schedule_trending())
+        self.assertIsNone(schedule_trending())
+        self.assertEqual(Job.objects.filter(status=Job.QUEUED).count(), 1)
+
+
+@override_settings(SIMILAR_POSTS_SIZE=20, SIMILAR_POSTS_MIN_CO_LIKES=2, SIMILAR_POSTS_CHUNK_SIZE=2)
+class SimilarPostTests(PostTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.users = [self.user] + [self.create_user(f'user{i}') for i in range(3)]
+        self.a, self.b, self.c, self.d = (self.create_post() for _ in range(4))
+
+    def like(self, users, *posts):
+        for user in users:
+            for post in posts:
+                post_likes.like(user, post.pk)
+
+    def similar(self, post):
+        return self.collect_pages(f'/post/{post.pk}/similar/?page_size=1')
+
+    def scores(self, post):
+        return dict(SimilarPost.objects.filter(post=post).values_list('similar_id', 'score'))
+
+    def test_neighbours_are_ranked_by_cosine_similarity(self):
+        self.like(self.users[:3], self.a, self.b)
+        self.like(self.users[:2], self.c)
+        self.like(self.users[3:], self.a, self.d)
+        self.assertEqual(update_similar_posts(), 4)
+        # d shares a single liker with a, below SIMILAR_POSTS_MIN_CO_LIKES.
+        scores = self.scores(self.a)
+        self.assertEqual(set(scores), {self.b.pk, self.c.pk})
+        self.assertAlmostEqual(scores[self.b.pk], 3 / (4 * 3) ** 0.5, places=5)
+        self.assertAlmostEqual(scores[self.c.pk], 2 / (4 * 2) ** 0.5, places=5)
+        self.assertEqual(self.similar(self.a), [str(self.b.pk), str(self.c.pk)])
+
+    def test_incremental_run_only_touches_co_liked_posts(self):
+        self.like(self.users[:2], self.a, self.b)
+        self.like(self.users[2:], self.c, self.d)
+        update_similar_posts()
+        since = timezone.now()
+        self.like(self.users[:2], self.d)
+        self.assertEqual(update_similar_posts(since), 4)
+        self.assertEqual(set(self.scores(self.a)), {self.b.pk, self.d.pk})
+        self.assertEqual(update_similar_posts(timezone.now()), 0)
+
+    def test_full_run_drops_posts_without_likes(self):
+        self.like(self.users[:2], self.a, self.b)
+        update_similar_posts()
+        for user in self.users[:2]:
+            post_likes.unlike(user, self.a.pk)
+        update_similar_posts()
+        self.assertFalse(SimilarPost.objects.filter(post=self.a).exists())
+        self.assertEqual(self.scores(self.b), {})
@@ -0,0 +1,81 @@
+import heapq
+
+from django.conf import settings
+
+from shared.custom_pagination import KeysetPagination
+from users.models import UserFollow
+from .models import Post, TimelineEntry
+
+
+def is_celebrity(user):
+    return user.followers_count >= settings.TIMELINE_CELEBRITY_FOLLOWERS
+
+
+def fan_out_post(post):
+    """
+    Pushes a new post into the home timeline of its author and, unless the
+    author is a celebrity, of every follower. Celebrity posts are pulled at read time.
+    """
+    batch_size = settings.TIMELINE_FANOUT_BATCH_SIZE
+    entries = [TimelineEntry(owner_id=post.author_id, post=post, created_at=post.created_at)]
+    if not is_celebrity(post.author):
+        follower_ids = (
+            UserFollow.objects.filter(following_id=post.author_id)
+            .values_list('follower_id', flat=True)
+            .iterator(chunk_size=batch_size)
+        )
+        for follower_id in follower_ids:
+            entries.append(TimelineEntry(owner_id=follower_id, post=post, created_at=post.created_at))
+            if len(entries) >= batch_size:
+                TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+                entries = []
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def backfill_timeline(follower, following):
+    if is_celebrity(following):
+        return
+    posts = Post.objects.filter(author=following).order_by('-created_at')[:settings.TIMELINE_BACKFILL_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [TimelineEntry(owner=follower, post=post, created_at=post.created_at) for post in posts],
+        ignore_conflicts=True,
+    )
+
+
+def prune_timeline(follower, following_id):
+    TimelineEntry.objects.filter(owner=follower, post__author_id=following_id).delete()
+
+
+def pulled_author_ids(user):
+    return list(
+        UserFollow.objects.filter(
+            follower=user,
+            following__followers_count__gte=settings.TIMELINE_CELEBRITY_FOLLOWERS,
+        ).values_list('following_id', flat=True)
+    )
+
+
+class TimelinePagination(KeysetPagination):
+    """
+    Pages the materialized timeline and merges in posts pulled from followed
+    celebrities (``view.get_pulled_queryset()``) on the same ``(created_at, id)`` key.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.start_page(queryset, request):
+            return None
+        posts = [entry.post for entry in self.keyset_slice(queryset, 'created_at', 'post_id')]
+        pulled = view.get_pulled_queryset() if view is not None else None
+        if pulled is not None:
+            merged = heapq.merge(
+                posts, self.keyset_slice(pulled),
+                key=lambda post: (post.created_at, post.pk),
+                reverse=not self.reverse,
+            )
+            seen = set()
+            posts = []
+            for post in merged:
+                if post.pk not in seen:
+                    seen.add(post.pk)
+                    posts.append(post)
+        return self.finish_page(posts)
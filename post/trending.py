@@ -0,0 +1,68 @@
+import logging
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from shared.jobs import ensure_scheduled
+from .models import Post, TrendingPost
+
+logger = logging.getLogger(__name__)
+
+
+def trending_scores(likes, comments, age_hours):
+    """
+    Scores whole arrays at once: engagement (comments weighted by
+    ``TRENDING_COMMENT_WEIGHT``) halved every ``TRENDING_HALF_LIFE_HOURS``.
+    """
+    engagement = likes + settings.TRENDING_COMMENT_WEIGHT * comments
+    return engagement * np.exp2(-age_hours / settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def top_k(scores, k):
+    # Indices of the ``k`` best positive scores, best first, without sorting the whole window.
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(scores[candidates], -k)[-k:]]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def compute_trending():
+    """
+    Scores the posts of the last ``TRENDING_WINDOW_HOURS`` from their stored
+    counters and replaces ``TrendingPost`` with the best ``TRENDING_SIZE``.
+    Returns the number of posts ranked.
+    """
+    now = timezone.now()
+    rows = list(
+        Post.objects.filter(created_at__gte=now - timedelta(hours=settings.TRENDING_WINDOW_HOURS))
+        .values_list('pk', 'created_at', 'likes_count', 'comments_count')
+        .iterator(chunk_size=10000)
+    )
+    trending = []
+    if rows:
+        ids, created, likes, comments = zip(*rows)
+        age_hours = (now.timestamp() - np.fromiter((c.timestamp() for c in created), float, len(created))) / 3600
+        scores = trending_scores(np.array(likes, dtype=float), np.array(comments, dtype=float), age_hours)
+        trending = [
+            TrendingPost(post_id=ids[i], score=float(scores[i]))
+            for i in top_k(scores, settings.TRENDING_SIZE)
+        ]
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(trending)
+    return len(trending)
+
+
+def run_trending():
+    # Periodic job: recomputes, then queues its next run.
+    ranked = compute_trending()
+    logger.info("Ranked %s trending posts", ranked)
+    schedule_trending()
+
+
+def schedule_trending():
+    # Makes sure one run_trending job is queued for the run_jobs worker.
+    return ensure_scheduled(run_trending, settings.TRENDING_INTERVAL)
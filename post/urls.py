@@ -1,16 +1,32 @@
 from django.urls import path
+from .async_views import AsyncPostListView, AsyncPostDetailView, AsyncPostCommentListView
 from .views import PostListAPIView,PostCreateAPIView, PostCommentListAPIView,PostRetrieveUpdateDestroyAPIView, PostCommentCreateAPIView,\
-    CommentListCreateAPIView, PostLikeListAPIView, CommentRetrieveAPIView, CommentLikeListAPIView, PostLikeAPIView, CommentLikeAPIView
+    CommentListCreateAPIView, PostLikeListAPIView, CommentRetrieveAPIView, CommentLikeListAPIView, PostLikeAPIView, CommentLikeAPIView, HomeTimelineAPIView, \
+    PostLikeStateAPIView, CommentLikeStateAPIView, PostSearchAPIView, CommentSearchAPIView, \
+    TagPostListAPIView, TagAutocompleteAPIView, TrendingPostListAPIView, \
+    SimilarPostListAPIView
 urlpatterns = [
     path('list/', PostListAPIView.as_view()),
     path('create/', PostCreateAPIView.as_view()),
+    path('timeline/', HomeTimelineAPIView.as_view()),
+    path('search/', PostSearchAPIView.as_view()),
+    path('trending/', TrendingPostListAPIView.as_view()),
+    path('tags/', TagAutocompleteAPIView.as_view()),
+    path('tags/<str:tag>/', TagPostListAPIView.as_view()),
     path('<uuid:pk>/', PostRetrieveUpdateDestroyAPIView.as_view()),
     path('<uuid:pk>/comments/', PostCommentListAPIView.as_view()),
+    path('<uuid:pk>/similar/', SimilarPostListAPIView.as_view()),
     path('<uuid:pk>/likes/', PostLikeListAPIView.as_view()),
     path('<uuid:pk>/comments/create/', PostCommentCreateAPIView.as_view()),
     path('comments/', CommentListCreateAPIView.as_view()),
+    path('comments/search/', CommentSearchAPIView.as_view()),
     path('comments/<uuid:pk>/', CommentRetrieveAPIView.as_view()),
     path('comments/<uuid:pk>/likes/', CommentLikeListAPIView.as_view()),
     path('<uuid:pk>/create-delete-like/', PostLikeAPIView.as_view()),
     path('comments/<uuid:pk>/create-delete-like/', CommentLikeAPIView.as_view()),
+    path('<uuid:pk>/like/', PostLikeStateAPIView.as_view()),
+    path('comments/<uuid:pk>/like/', CommentLikeStateAPIView.as_view()),
+    path('async/list/', AsyncPostListView.as_view()),
+    path('async/<uuid:pk>/', AsyncPostDetailView.as_view()),
+    path('async/<uuid:pk>/comments/', AsyncPostCommentListView.as_view()),
 ]
\ No newline at end of file
@@ -1,29 +1,176 @@
+from django.db import transaction
+from django.db.models import F
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import ListAPIView, CreateAPIView, RetrieveUpdateDestroyAPIView, ListCreateAPIView, \
     RetrieveAPIView
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Post, PostLike, PostComment, CommentLike
-from .serializers import PostSerializer, PostLikeSerializer, CommentSerializer, CommentLikeSerializer
-from shared.custom_pagination import CustomPagination
+from .cache import get_post_detail
+from .counters import adjust_counter
+from .likes import post_likes, comment_likes
+from .mixins import PostViewerStateMixin, CommentViewerStateMixin, CommentTreeMixin
+from .models import Post, PostLike, PostComment, CommentLike, TimelineEntry, Tag, TaggedPost
+from .search import post_index, comment_index
+from .serializers import PostSerializer, PostLikeSerializer, CommentSerializer, CommentLikeSerializer, LikeStateSerializer, \
+    TagSerializer
+from .tags import TagFeedPagination, autocomplete_tags, normalize_tag
+from .timeline import TimelinePagination, fan_out_post, pulled_author_ids
+from shared.custom_pagination import KeysetPagination, RankKeysetPagination
+from shared.images import schedule_variants
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework.parsers import MultiPartParser, FormParser
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 
 
-class PostListAPIView(ListAPIView):
+class PostListAPIView(PostViewerStateMixin, ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [AllowAny, ]
-    pagination_class = CustomPagination
+    trust_token_claims = True
+    pagination_class = KeysetPagination
 
     @swagger_auto_schema(
         operation_summary="List all posts",
-        operation_description="Retrieve a paginated list of all posts.",
+        operation_description="Retrieve a cursor-paginated list of all posts, newest first.",
         responses={200: PostSerializer(many=True)}
     )
     def get_queryset(self):
-        return Post.objects.all()
+        return Post.objects.select_related('author')
+
+
+class SearchMixin:
+    search_index = None
+    search_query_param = 'q'
+    pagination_class = RankKeysetPagination
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return self.search_index.model.objects.none()
+        text = self.request.query_params.get(self.search_query_param, '').strip()
+        if not text:
+            raise ValidationError({self.search_query_param: "This parameter is required."})
+        return self.search_index.search(self.get_search_queryset(), text)
+
+
+search_query_parameter = openapi.Parameter(
+    'q', openapi.IN_QUERY, description="Words to look for.", type=openapi.TYPE_STRING, required=True
+)
+
+
+class PostSearchAPIView(SearchMixin, PostViewerStateMixin, ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [AllowAny, ]
+    trust_token_claims = True
+    search_index = post_index
+
+    @swagger_auto_schema(
+        operation_summary="Search posts",
+        operation_description="Full-text search over post captions, best match first.",
+        manual_parameters=[search_query_parameter],
+        responses={200: PostSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_search_queryset(self):
+        return Post.objects.select_related('author')
+
+
+class CommentSearchAPIView(SearchMixin, CommentTreeMixin, CommentViewerStateMixin, ListAPIView):
+    serializer_class = CommentSerializer
+    permission_classes = [AllowAny, ]
+    trust_token_claims = True
+    search_index = comment_index
+
+    @swagger_auto_schema(
+        operation_summary="Search comments",
+        operation_description="Full-text search over comments, best match first.",
+        manual_parameters=[search_query_parameter],
+        responses={200: CommentSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_search_queryset(self):
+        return PostComment.objects.select_related('author')
+
+
+class TrendingPostListAPIView(PostViewerStateMixin, ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [AllowAny, ]
+    trust_token_claims = True
+    pagination_class = RankKeysetPagination
+
+    @swagger_auto_schema(
+        operation_summary="Trending posts",
+        operation_description="Retrieve the precomputed trending ranking, highest score first.",
+        responses={200: PostSerializer(many=True)}
+    )
+    def get_queryset(self):
+        return Post.objects.filter(trending__isnull=False).annotate(rank=F('trending__score')).select_related('author')
+
+
+class SimilarPostListAPIView(PostViewerStateMixin, ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [AllowAny, ]
+    trust_token_claims = True
+    pagination_class = RankKeysetPagination
+
+    @swagger_auto_schema(
+        operation_summary="Similar posts",
+        operation_description="Retrieve the posts most often liked by the same users as this one, most similar first.",
+        responses={200: PostSerializer(many=True)}
+    )
+    def get_queryset(self):
+        return Post.objects.filter(similar_to__post_id=self.kwargs['pk']).annotate(
+            rank=F('similar_to__score')
+        ).select_related('author')
+
+
+class TagPostListAPIView(PostViewerStateMixin, ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [AllowAny, ]
+    trust_token_claims = True
+    pagination_class = TagFeedPagination
+
+    @swagger_auto_schema(
+        operation_summary="Posts with a hashtag",
+        operation_description="Retrieve the posts tagged with `#tag`, newest first, together with the tag and its post count.",
+        responses={200: PostSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        response.data['tag'] = TagSerializer(self.tag).data
+        return response
+
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return TaggedPost.objects.none()
+        self.tag = get_object_or_404(Tag, name=normalize_tag(self.kwargs['tag']))
+        return TaggedPost.objects.filter(tag=self.tag).select_related('post__author')
+
+
+class TagAutocompleteAPIView(APIView):
+    permission_classes = [AllowAny, ]
+
+    @swagger_auto_schema(
+        operation_summary="Autocomplete hashtags",
+        operation_description="Tags starting with `q`, most used first.",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Beginning of the tag, with or without `#`.",
+                              type=openapi.TYPE_STRING, required=True)
+        ],
+        responses={200: TagSerializer(many=True)}
+    )
+    def get(self, request):
+        prefix = request.query_params.get('q', '').strip()
+        if not prefix.lstrip('#'):
+            return Response([])
+        tags = autocomplete_tags(prefix, settings.TAG_AUTOCOMPLETE_LIMIT)
+        return Response(TagSerializer(tags, many=True).data)
 
 
 class PostCreateAPIView(CreateAPIView):
@@ -41,13 +188,41 @@ class PostCreateAPIView(CreateAPIView):
             401: 'Unauthorized'
         }
     )
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        schedule_variants(post.image)
+        fan_out_post(post)
+
+
+class HomeTimelineAPIView(PostViewerStateMixin, ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated, ]
+    trust_token_claims = True
+    pagination_class = TimelinePagination
+
+    @swagger_auto_schema(
+        operation_summary="Home timeline",
+        operation_description="Retrieve posts of the accounts the user follows, newest first.",
+        responses={200: PostSerializer(many=True)}
+    )
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return TimelineEntry.objects.none()
+        return TimelineEntry.objects.filter(owner=self.request.user).select_related('post__author')
+
+    def get_pulled_queryset(self):
+        author_ids = pulled_author_ids(self.request.user)
+        if not author_ids:
+            return None
+        return Post.objects.filter(author_id__in=author_ids).select_related('author')
+
 
 class PostRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    trust_token_claims = True
 
     @swagger_auto_schema(
         operation_summary="Retrieve a post",
@@ -55,9 +230,7 @@ class PostRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         responses={status.HTTP_200_OK: openapi.Response('Success', PostSerializer)}
     )
     def get(self, request, *args, **kwargs):
-        post = self.get_object()
-        serializer = self.serializer_class(post, context={'request': request})
-        return Response(serializer.data)
+        return Response(get_post_detail(kwargs['pk'], request))
 
     @swagger_auto_schema(
         operation_summary="Update a post",
@@ -70,6 +243,8 @@ class PostRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         serializer = self.serializer_class(post, data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        if 'image' in serializer.validated_data:
+            schedule_variants(post.image)
         return Response(serializer.data)
 
     @swagger_auto_schema(
@@ -87,20 +262,28 @@ class PostRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
         })
 
 
-class PostCommentListAPIView(ListAPIView):
+class PostCommentListAPIView(CommentTreeMixin, CommentViewerStateMixin, ListAPIView):
     serializer_class = CommentSerializer
     permission_classes = [AllowAny,]
+    trust_token_claims = True
 
     @swagger_auto_schema(
         operation_summary="List comments for a post",
-        operation_description="Retrieve all comments for a specific post by its ID.",
+        operation_description="Retrieve the top-level comments of a specific post with their nested replies.",
         responses={200: CommentSerializer(many=True)}
     )
     def get_queryset(self):
         post_id = self.kwargs['pk']
-        queryset = PostComment.objects.filter(post_id=post_id)
+        queryset = PostComment.objects.filter(post_id=post_id, parent=None).select_related('author')
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        # Only an empty list needs a second look to tell a quiet post from a missing one.
+        if not response.data and not Post.objects.filter(pk=kwargs['pk']).exists():
+            raise NotFound()
+        return response
+
 
 class PostCommentCreateAPIView(CreateAPIView):
     serializer_class = CommentSerializer
@@ -112,16 +295,19 @@ class PostCommentCreateAPIView(CreateAPIView):
         request_body=CommentSerializer,
         responses={201: CommentSerializer}
     )
+    @transaction.atomic
     def perform_create(self, serializer):
         post_id = self.kwargs['pk']
         serializer.save(author=self.request.user, post_id=post_id)
+        adjust_counter(Post, post_id, 'comments_count', 1)
 
 
-class CommentListCreateAPIView(ListCreateAPIView):
+class CommentListCreateAPIView(CommentTreeMixin, CommentViewerStateMixin, ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, ]
-    queryset = PostComment.objects.all()
-    pagination_class = CustomPagination
+    trust_token_claims = True
+    queryset = PostComment.objects.select_related('author')
+    pagination_class = KeysetPagination
 
     @swagger_auto_schema(
         operation_summary="List and create comments",
@@ -132,13 +318,17 @@ class CommentListCreateAPIView(ListCreateAPIView):
     def get_queryset(self):
         return self.queryset
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        comment = serializer.save(author=self.request.user)
+        adjust_counter(Post, comment.post_id, 'comments_count', 1)
 
 
 class PostLikeListAPIView(ListAPIView):
     serializer_class = PostLikeSerializer
     permission_classes = [AllowAny,]
+    trust_token_claims = True
+    pagination_class = KeysetPagination
 
     @swagger_auto_schema(
         operation_summary="List likes for a post",
@@ -147,13 +337,14 @@ class PostLikeListAPIView(ListAPIView):
     )
     def get_queryset(self):
         post_id = self.kwargs['pk']
-        queryset = PostLike.objects.filter(post_id=post_id)
+        queryset = PostLike.objects.filter(post_id=post_id).select_related('author')
         return queryset
 
 
 class CommentRetrieveAPIView(RetrieveAPIView):
     serializer_class = CommentSerializer
     permission_classes = [AllowAny, ]
+    trust_token_claims = True
     queryset = PostComment.objects.all()
 
     @swagger_auto_schema(
@@ -168,6 +359,8 @@ class CommentRetrieveAPIView(RetrieveAPIView):
 class CommentLikeListAPIView(ListAPIView):
     serializer_class = CommentLikeSerializer
     permission_classes = [AllowAny,]
+    trust_token_claims = True
+    pagination_class = KeysetPagination
 
     @swagger_auto_schema(
         operation_summary="List likes for a comment",
@@ -176,36 +369,44 @@ class CommentLikeListAPIView(ListAPIView):
     )
     def get_queryset(self):
         comment_id = self.kwargs['pk']
-        queryset = CommentLike.objects.filter(comment_id=comment_id)
+        queryset = CommentLike.objects.filter(comment_id=comment_id).select_related('author')
         return queryset
 
 
 class PostLikeAPIView(APIView):
+    likes = post_likes
+    like_message = "Post liked successfully."
+    like_serializer_class = PostLikeSerializer
+
     @swagger_auto_schema(
         operation_summary="Like a post",
-        operation_description="Allows an authenticated user to like a specific post.",
+        operation_description="Allows an authenticated user to like a specific post. "
+                              "Liking twice is not an error; `changed` tells whether a like was added.",
         responses={201: PostLikeSerializer}
     )
     def post(self, request, pk):
-        try:
-            post_like = PostLike.objects.create(
-                author=self.request.user,
-                post_id=pk,
-            )
-            serializer = PostLikeSerializer(post_like)
+        changed = self.likes.like(request.user, pk)
+        if not changed:
+            if changed is None or not self.likes.target_exists(pk):
+                raise NotFound()
             data = {
                 "success": True,
-                "message": "Post liked successfully.",
-                "data": serializer.data
-            }
-            return Response(data, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            data = {
-                "success": False,
-                "message": str(e),
+                "changed": False,
+                "message": "You have already liked this.",
                 "data": None
             }
-            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+            return Response(data, status=status.HTTP_200_OK)
+        like = self.likes.model.objects.select_related('author').filter(
+            author=request.user, **{self.likes.target.name: pk}
+        ).first()
+        data = {
+            "success": True,
+            "changed": True,
+            "message": self.like_message,
+            "data": self.like_serializer_class(like).data if like is not None else None
+        }
+        # Without the row the like is still waiting in the write-behind buffer.
+        return Response(data, status=status.HTTP_201_CREATED if like is not None else status.HTTP_202_ACCEPTED)
 
     @swagger_auto_schema(
         operation_summary="Unlike a post",
@@ -213,50 +414,36 @@ class PostLikeAPIView(APIView):
         responses={204: "Like removed successfully"}
     )
     def delete(self, request, pk):
-        try:
-            post_like = PostLike.objects.get(author=self.request.user, post_id=pk)
-            post_like.delete()
+        if not self.likes.unlike(request.user, pk):
             data = {
                 "success": True,
-                "message": "You took your LIKE back",
-                "data": None
-            }
-            return Response(data, status=status.HTTP_204_NO_CONTENT)
-        except Exception as e:
-            data = {
-                "success": False,
-                "message": str(e),
+                "changed": False,
+                "message": "There was no LIKE to take back",
                 "data": None
             }
-            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+            return Response(data, status=status.HTTP_200_OK)
+        data = {
+            "success": True,
+            "changed": True,
+            "message": "You took your LIKE back",
+            "data": None
+        }
+        return Response(data, status=status.HTTP_204_NO_CONTENT)
 
 
-class CommentLikeAPIView(APIView):
+class CommentLikeAPIView(PostLikeAPIView):
+    likes = comment_likes
+    like_message = "Comment liked successfully."
+    like_serializer_class = CommentLikeSerializer
+
     @swagger_auto_schema(
         operation_summary="Like a comment",
-        operation_description="Allows an authenticated user to like a specific comment.",
+        operation_description="Allows an authenticated user to like a specific comment. "
+                              "Liking twice is not an error; `changed` tells whether a like was added.",
         responses={201: CommentLikeSerializer}
     )
     def post(self, request, pk):
-        try:
-            comment_like = CommentLike.objects.create(
-                author=self.request.user,
-                comment_id=pk,
-            )
-            serializer = CommentLikeSerializer(comment_like)
-            data = {
-                "success": True,
-                "message": "Comment liked successfully.",
-                "data": serializer.data
-            }
-            return Response(data, status=status.HTTP_201_CREATED)
-        except Exception as e:
-            data = {
-                "success": False,
-                "message": str(e),
-                "data": None
-            }
-            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        return super().post(request, pk)
 
     @swagger_auto_schema(
         operation_summary="Unlike a comment",
@@ -264,19 +451,49 @@ class CommentLikeAPIView(APIView):
         responses={204: "Like removed successfully"}
     )
     def delete(self, request, pk):
-        try:
-            comment_like = CommentLike.objects.get(author=self.request.user, comment_id=pk)
-            comment_like.delete()
-            data = {
-                "success": True,
-                "message": "You took your LIKE back",
-                "data": None
-            }
-            return Response(data, status=status.HTTP_204_NO_CONTENT)
-        except Exception as e:
-            data = {
-                "success": False,
-                "message": str(e),
-                "data": None
-            }
-            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        return super().delete(request, pk)
+
+
+class PostLikeStateAPIView(APIView):
+    likes = post_likes
+
+    @swagger_auto_schema(
+        operation_summary="Set or toggle a like on a post",
+        operation_description="Sets the like to `liked`, or toggles it when `liked` is left out. "
+                              "Safe to retry: `changed` tells whether this call changed anything.",
+        request_body=LikeStateSerializer,
+        responses={200: LikeStateSerializer}
+    )
+    def put(self, request, pk):
+        serializer = LikeStateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        liked = serializer.validated_data['liked']
+        if liked is None:
+            liked = self.likes.toggle(request.user, pk)
+            changed = liked is not None
+        else:
+            changed = self.likes.set(request.user, pk, liked)
+            if not changed and liked and not self.likes.target_exists(pk):
+                liked = None
+        if liked is None:
+            raise NotFound()
+        data = {
+            "success": True,
+            "liked": liked,
+            "changed": changed,
+        }
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class CommentLikeStateAPIView(PostLikeStateAPIView):
+    likes = comment_likes
+
+    @swagger_auto_schema(
+        operation_summary="Set or toggle a like on a comment",
+        operation_description="Sets the like to `liked`, or toggles it when `liked` is left out. "
+                              "Safe to retry: `changed` tells whether this call changed anything.",
+        request_body=LikeStateSerializer,
+        responses={200: LikeStateSerializer}
+    )
+    def put(self, request, pk):
+        return super().put(request, pk)
@@ -1,3 +1,10 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'func', 'status', 'attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'func')
+    ordering = ('run_at',)
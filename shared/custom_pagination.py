@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination, Cursor
 from rest_framework.response import Response
 
 
@@ -15,4 +23,163 @@ class CustomPagination(PageNumberPagination):
                 "count": self.page.paginator.count,
                 "results": data,
             }
-        )
\ No newline at end of file
+        )
+
+
+def estimate_count(queryset):
+    # Postgres already knows roughly how many rows a query touches; ask the planner instead of counting.
+    if connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        if isinstance(plan, list):
+            plan = plan[0]
+        return int(plan['Plan']['Plan Rows'])
+    return queryset.count()
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination over ``(created_at, id)``, newest first.
+
+    Every page is a range scan on the ``(created_at, id)`` index starting right
+    after the last row of the previous page, so there is no OFFSET and no COUNT(*).
+    ``?count=true`` adds a planner estimate of the total number of rows.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.start_page(queryset, request):
+            return None
+        return self.finish_page(self.keyset_slice(queryset))
+
+    def start_page(self, queryset, request, count=True):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return False
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        self.count = None
+        if count and self.count_requested(request):
+            self.count = estimate_count(queryset)
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        self.position = None
+        if self.cursor is not None and self.cursor.position is not None:
+            self.position = self.decode_position(self.cursor.position)
+        return True
+
+    def count_requested(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true', 'yes')
+
+    async def apaginate_queryset(self, queryset, request):
+        # For async views: only the count estimate, when asked for, still runs in a thread.
+        if not self.start_page(queryset, request, count=False):
+            return None
+        if self.count_requested(request):
+            self.count = await sync_to_async(estimate_count)(queryset)
+        rows = self.keyset_queryset(queryset)[:self.page_size + 1]
+        return self.finish_page([row async for row in rows])
+
+    def keyset_slice(self, queryset, time_field='created_at', id_field='id'):
+        """
+        Returns up to ``page_size + 1`` rows of ``queryset`` that come after the
+        current cursor, in scan order, keyed on ``(time_field, id_field)``.
+        """
+        return list(self.keyset_queryset(queryset, time_field, id_field)[:self.page_size + 1])
+
+    def keyset_queryset(self, queryset, time_field='created_at', id_field='id'):
+        if self.reverse:
+            queryset = queryset.order_by(time_field, id_field)
+        else:
+            queryset = queryset.order_by(f'-{time_field}', f'-{id_field}')
+
+        if self.position is not None:
+            created_at, pk = self.position
+            lookup = 'gt' if self.reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__{lookup}': created_at}) |
+                Q(**{time_field: created_at, f'{id_field}__{lookup}': pk})
+            )
+        return queryset
+
+    def finish_page(self, results):
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def encode_position(self, instance):
+        return f"{instance.created_at.isoformat()}|{instance.pk}"
+
+    def decode_position(self, position):
+        try:
+            created_at, pk = position.split('|', 1)
+            created_at = parse_datetime(created_at)
+            pk = uuid.UUID(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.encode_position(self.page[0])))
+
+    def get_paginated_response(self, data):
+        response = {
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        }
+        if self.count is not None:
+            response["count"] = self.count
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        schema = super().get_paginated_response_schema(schema)
+        schema['properties']['count'] = {
+            'type': 'integer',
+            'nullable': True,
+            'example': 123,
+        }
+        return schema
+
+
+class RankKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination over ``(rank, id)``, highest rank first, for querysets
+    annotated with a numeric ``rank`` (search relevance, trending score).
+    """
+    ordering = ('-rank', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.start_page(queryset, request):
+            return None
+        return self.finish_page(self.keyset_slice(queryset, 'rank', 'id'))
+
+    def encode_position(self, instance):
+        return f"{instance.rank!r}|{instance.pk}"
+
+    def decode_position(self, position):
+        try:
+            rank, pk = position.split('|', 1)
+            return float(rank), uuid.UUID(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,116 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from PIL import Image
+
+from .jobs import enqueue
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+
+
+def variant_name(name, size):
+    root, ext = os.path.splitext(name)
+    return f"{root}_{size}{ext}"
+
+
+def variant_urls(field_file, request=None):
+    """
+    ``{size: url}`` for the thumbnails of an image field, or None when the field is empty.
+    URLs are derived from the name, so a variant may 404 for a moment right after upload.
+    """
+    if not field_file:
+        return None
+    urls = {}
+    for size in settings.IMAGE_VARIANT_SIZES:
+        url = field_file.storage.url(variant_name(field_file.name, size))
+        urls[str(size)] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def render_variants(path, sizes, overwrite=False):
+    # Runs in a pool worker: plain paths in, plain names out, no Django state.
+    written = []
+    if not overwrite:
+        sizes = [size for size in sizes if not os.path.exists(variant_name(path, size))]
+        if not sizes:
+            return written
+    with Image.open(path) as image:
+        image.load()
+        for size in sizes:
+            target = variant_name(path, size)
+            variant = image.copy()
+            variant.thumbnail((size, size), Image.LANCZOS)
+            if image.format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+                variant = variant.convert('RGB')
+            variant.save(target, format=image.format, optimize=True)
+            written.append(target)
+    return written
+
+
+def render_image_variants(path):
+    # Job queue entry point for renders the process pool had no room for.
+    render_variants(path, tuple(settings.IMAGE_VARIANT_SIZES))
+
+
+def delete_orphan_variants(storage, name):
+    # Variants follow the original: once it is gone from storage, so are they.
+    if not name or storage.exists(name):
+        return
+    for size in settings.IMAGE_VARIANT_SIZES:
+        path = storage.path(variant_name(name, size))
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            workers = settings.IMAGE_VARIANT_WORKERS
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _slots = threading.BoundedSemaphore(workers + settings.IMAGE_VARIANT_MAX_PENDING)
+        return _pool
+
+
+def _log_result(future):
+    _slots.release()
+    error = future.exception()
+    if error is not None:
+        logger.error("Could not render image variants: %s", error)
+
+
+def schedule_variants(field_file):
+    """
+    Renders the thumbnails of ``field_file`` in the background process pool once
+    the current transaction commits. When the pool is saturated, or refuses the
+    job, the render goes to the job queue instead of blocking the request.
+    """
+    if not field_file:
+        return
+    path = field_file.path
+
+    def submit():
+        pool = _get_pool()
+        if not _slots.acquire(blocking=False):
+            logger.info("Image variant pool is saturated, queueing %s", path)
+            enqueue(render_image_variants, path=path)
+            return
+        try:
+            future = pool.submit(render_variants, path, tuple(settings.IMAGE_VARIANT_SIZES))
+        except Exception:
+            _slots.release()
+            logger.exception("Could not schedule image variants for %s, queueing it", path)
+            enqueue(render_image_variants, path=path)
+            return
+        future.add_done_callback(_log_result)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,115 @@
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def job_path(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, max_attempts=None, delay=None, **kwargs):
+    """
+    Queues ``func(**kwargs)`` for the ``run_jobs`` worker. ``kwargs`` must be JSON
+    serializable. With ``JOB_QUEUE_EAGER`` the job runs right away in-process.
+    """
+    path = job_path(func)
+    if settings.JOB_QUEUE_EAGER:
+        func(**kwargs)
+        return None
+    run_at = timezone.now() + (delay or timedelta())
+    return Job.objects.create(
+        func=path,
+        kwargs=kwargs,
+        run_at=run_at,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def ensure_scheduled(func, interval, **kwargs):
+    """
+    Makes sure one ``func(**kwargs)`` job is queued to run ``interval`` seconds
+    from now, for periodic jobs that queue their own next run. Returns the new
+    job, or None when one is already queued or with ``JOB_QUEUE_EAGER``, where
+    there is no worker to run it later.
+    """
+    if settings.JOB_QUEUE_EAGER:
+        return None
+    if Job.objects.filter(func=job_path(func), status=Job.QUEUED).exists():
+        return None
+    return enqueue(func, delay=timedelta(seconds=interval), **kwargs)
+
+
+def claim_jobs(limit, func=None, exclude=()):
+    """
+    Marks up to ``limit`` due jobs as running and returns them. Rows are locked
+    with SKIP LOCKED where the database supports it, and the conditional UPDATE
+    makes sure two workers never get the same job either way.
+    """
+    now = timezone.now()
+    jobs = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+    if func is not None:
+        jobs = jobs.filter(func=func)
+    if exclude:
+        jobs = jobs.exclude(func__in=exclude)
+    with transaction.atomic():
+        candidates = list(
+            jobs.select_for_update(skip_locked=True)
+            .order_by('run_at')
+            .values_list('pk', flat=True)[:limit]
+        )
+        claimed = []
+        for pk in candidates:
+            if Job.objects.filter(pk=pk, status=Job.QUEUED).update(status=Job.RUNNING, locked_at=now):
+                claimed.append(pk)
+    return list(Job.objects.filter(pk__in=claimed))
+
+
+def requeue_stale_jobs():
+    # Jobs whose worker died mid-run are handed out again after JOB_LOCK_TIMEOUT.
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff).update(status=Job.QUEUED, locked_at=None)
+
+
+def backoff(attempts):
+    delay = settings.JOB_RETRY_BACKOFF * (2 ** (attempts - 1))
+    return timedelta(seconds=min(delay, settings.JOB_RETRY_BACKOFF_MAX) * random.uniform(0.8, 1.2))
+
+
+def complete_job(job):
+    Job.objects.filter(pk=job.pk).delete()
+
+
+def fail_job(job, error):
+    attempts = job.attempts + 1
+    if attempts >= job.max_attempts:
+        logger.error("Job %s (%s) moved to dead letters after %s attempts", job.pk, job.func, attempts)
+        Job.objects.filter(pk=job.pk).update(status=Job.DEAD, attempts=attempts, locked_at=None, last_error=error)
+    else:
+        logger.warning("Job %s (%s) failed, retrying", job.pk, job.func)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.QUEUED,
+            attempts=attempts,
+            locked_at=None,
+            last_error=error,
+            run_at=timezone.now() + backoff(attempts),
+        )
+
+
+def run_job(job):
+    try:
+        import_string(job.func)(**job.kwargs)
+    except Exception:
+        fail_job(job, traceback.format_exc())
+        return False
+    complete_job(job)
+    return True
@@ -0,0 +1,103 @@
+import logging
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+from .jobs import claim_jobs, complete_job, fail_job, job_path
+from .utility import build_code_email, deliver_email
+
+logger = logging.getLogger(__name__)
+
+
+class EmailBatchSender:
+    """
+    Sends queued verification emails in groups of ``batch_size`` over a single
+    ``get_connection()`` session per group, so the SMTP handshake is paid once
+    per batch instead of once per message. ``run_jobs`` drains the queue through
+    it every ``flush_interval`` seconds.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None, backend=None):
+        self.batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+        self.flush_interval = settings.EMAIL_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.backend = backend
+        self.last_flush = 0.0
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    @property
+    def throughput(self):
+        return self.sent / self.seconds if self.seconds else 0.0
+
+    def metrics(self):
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'batches': self.batches,
+            'seconds': round(self.seconds, 3),
+            'messages_per_second': round(self.throughput, 1),
+        }
+
+    def due(self):
+        return time.monotonic() - self.last_flush >= self.flush_interval
+
+    def send_batch(self, messages):
+        """
+        Sends ``messages`` over one connection and returns, per message, None on
+        success or the formatted error.
+        """
+        results = []
+        started = time.monotonic()
+        try:
+            with get_connection(backend=self.backend) as connection:
+                for message in messages:
+                    message.connection = connection
+                    try:
+                        connection.send_messages([message])
+                        results.append(None)
+                    except Exception:
+                        results.append(traceback.format_exc())
+        except Exception:
+            # Opening or closing the session failed: whatever is not sent yet failed with it.
+            error = traceback.format_exc()
+            results.extend([error] * (len(messages) - len(results)))
+        with self.lock:
+            self.seconds += time.monotonic() - started
+            self.batches += 1
+            self.sent += sum(1 for result in results if result is None)
+            self.failed += sum(1 for result in results if result is not None)
+        return results
+
+    def drain(self):
+        """
+        Claims due ``deliver_email`` jobs batch by batch until the queue is empty
+        and returns how many were handled.
+        """
+        self.last_flush = time.monotonic()
+        func = job_path(deliver_email)
+        handled = 0
+        while True:
+            jobs = claim_jobs(self.batch_size, func=func)
+            handled += len(jobs)
+            if not jobs:
+                return handled
+            ready, messages = [], []
+            for job in jobs:
+                try:
+                    messages.append(build_code_email(**job.kwargs))
+                    ready.append(job)
+                except Exception:
+                    fail_job(job, traceback.format_exc())
+            for job, error in zip(ready, self.send_batch(messages)):
+                if error is None:
+                    complete_job(job)
+                else:
+                    fail_job(job, error)
+            if len(jobs) < self.batch_size:
+                return handled
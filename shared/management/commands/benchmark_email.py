@@ -0,0 +1,69 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management.base import BaseCommand
+
+from shared.mailer import EmailBatchSender
+from shared.utility import build_code_email
+
+
+class HandshakeDelayBackend(EmailBackend):
+    """
+    locmem backend that sleeps in open() to stand in for the SMTP handshake and,
+    like the SMTP backend, opens a connection for send_messages() if none is open.
+    """
+    handshake_delay = 0.0
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.opened = False
+
+    def open(self):
+        if self.opened:
+            return False
+        time.sleep(self.handshake_delay)
+        self.opened = True
+        return True
+
+    def close(self):
+        self.opened = False
+
+    def send_messages(self, messages):
+        new_connection = self.open()
+        try:
+            return super().send_messages(messages)
+        finally:
+            if new_connection:
+                self.close()
+
+
+class Command(BaseCommand):
+    help = "Compare one-connection-per-message delivery with EmailBatchSender."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--handshake-delay', type=float, default=0.005,
+                            help="Seconds each new connection costs; 0 measures pure overhead.")
+        parser.add_argument('--backend', default=None,
+                            help="Email backend to use instead of the simulated locmem one.")
+
+    def handle(self, *args, **options):
+        backend = options['backend']
+        if backend is None:
+            HandshakeDelayBackend.handshake_delay = options['handshake_delay']
+            backend = f"{HandshakeDelayBackend.__module__}.{HandshakeDelayBackend.__qualname__}"
+        count = options['count']
+        messages = [build_code_email(f"user{i}@example.com", f"{i % 10000:04d}") for i in range(count)]
+
+        started = time.monotonic()
+        for message in messages:
+            get_connection(backend=backend).send_messages([message])
+        single = time.monotonic() - started
+        self.stdout.write(f"one connection per message: {count / single:,.0f} msg/s ({single:.3f}s)")
+
+        sender = EmailBatchSender(batch_size=options['batch_size'], backend=backend)
+        for start in range(0, count, sender.batch_size):
+            sender.send_batch(messages[start:start + sender.batch_size])
+        self.stdout.write(f"batched ({sender.batch_size} per connection): {sender.throughput:,.0f} msg/s {sender.metrics()}")
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shared.sms import LocMemTransport, SmsDispatcher
+
+
+class Command(BaseCommand):
+    help = "Compare sequential SMS sends with the bounded concurrent dispatcher on the local fake transport."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200)
+        parser.add_argument('--latency', type=float, default=0.05, help="Simulated provider round trip in seconds.")
+        parser.add_argument('--max-in-flight', type=int, default=8)
+
+    def handle(self, *args, **options):
+        count = options['count']
+        messages = [(f"+99890000{i:04d}", f"Your verification code is: {i % 10000:04d}\n") for i in range(count)]
+
+        transport = LocMemTransport(options['latency'])
+        started = time.monotonic()
+        for to, body in messages:
+            transport.send(to, body)
+        sequential = time.monotonic() - started
+        self.stdout.write(f"sequential: {count / sequential:,.0f} msg/s ({sequential:.3f}s)")
+
+        dispatcher = SmsDispatcher(LocMemTransport(options['latency']), options['max_in_flight'])
+        started = time.monotonic()
+        dispatcher.send_many(messages)
+        concurrent = time.monotonic() - started
+        dispatcher.executor.shutdown()
+        self.stdout.write(
+            f"dispatcher ({options['max_in_flight']} in flight): {count / concurrent:,.0f} msg/s ({concurrent:.3f}s)"
+        )
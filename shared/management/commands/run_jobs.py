@@ -0,0 +1,100 @@
+import logging
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from shared.jobs import claim_jobs, job_path, requeue_stale_jobs, run_job
+from shared.mailer import EmailBatchSender
+from shared.sms import SmsBatchSender
+from shared.utility import deliver_email, deliver_phone_code
+
+
+logger = logging.getLogger(__name__)
+
+
+def _drain(sender):
+    try:
+        return sender.drain()
+    except Exception:
+        logger.exception("%s batch failed", type(sender).__name__)
+        return 0
+    finally:
+        connection.close()
+
+
+def _run(job):
+    try:
+        return run_job(job)
+    except Exception:
+        logger.exception("Could not record the result of job %s", job.pk)
+        return False
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs with a fixed-size worker pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.JOB_WORKERS)
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL)
+        parser.add_argument('--once', action='store_true', help="Exit once no job is due.")
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.set())
+
+        # Verification codes bypass the generic path: emails go out in batches over one
+        # SMTP session, texts in batches through the concurrent SMS dispatcher.
+        email_sender, sms_sender = EmailBatchSender(), SmsBatchSender()
+        senders = [email_sender, sms_sender]
+        batched_funcs = [job_path(deliver_email), job_path(deliver_phone_code)]
+        draining = {}
+        drained = dict.fromkeys(senders)
+
+        processed = failed = 0
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while not stopping.is_set():
+                close_old_connections()
+                requeue_stale_jobs()
+                for sender in senders:
+                    if sender in draining.values() or len(running) >= workers:
+                        continue
+                    if (not options['once'] or drained[sender] != 0) and sender.due():
+                        future = pool.submit(_drain, sender)
+                        draining[future] = sender
+                        running.add(future)
+                free = workers - len(running)
+                jobs = claim_jobs(free, exclude=batched_funcs) if free else []
+                for job in jobs:
+                    running.add(pool.submit(_run, job))
+
+                if not running:
+                    if options['once']:
+                        break
+                    stopping.wait(options['poll_interval'])
+                    continue
+
+                done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in draining:
+                        drained[draining.pop(future)] = future.result()
+                        continue
+                    processed += 1
+                    if not future.result():
+                        failed += 1
+            wait(running)
+
+        for sender in senders:
+            processed += sender.sent + sender.failed
+            failed += sender.failed
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs, {failed} failed."))
+        self.stdout.write(f"Email batches: {email_sender.metrics()}")
+        self.stdout.write(f"SMS batches: {sms_sender.metrics()}")
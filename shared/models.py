@@ -9,3 +9,47 @@ class BaseModel(models.Model):
     deleted_at = models.DateTimeField(null=True, blank=True)
     class Meta:
         abstract = True
+
+
+class StoredBlob(BaseModel):
+    """
+    Reference count of a content-addressed file written by ``ContentAddressedStorage``.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
+class Job(BaseModel):
+    """
+    A unit of background work. ``func`` is the dotted path of the callable that
+    ``run_jobs`` invokes with ``kwargs``; successful jobs are removed, jobs that
+    exhaust ``max_attempts`` stay behind as dead letters.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DEAD = "dead"
+    STATUS_CHOICES = (
+        (QUEUED, QUEUED),
+        (RUNNING, RUNNING),
+        (DEAD, DEAD),
+    )
+
+    func = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.func} ({self.status})"
@@ -0,0 +1,112 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key within one process: the first
+    caller runs ``fn`` and every other thread asking for that key meanwhile
+    waits for and shares its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+_flight = SingleFlight()
+
+
+def _stale_key(key):
+    return f"{key}:stale"
+
+
+def _lock_key(key):
+    return f"{key}:lock"
+
+
+def _recompute(key, compute, timeout):
+    """
+    Cross-process part: the worker that wins ``cache.add`` on the lock key
+    recomputes; the others serve the stale copy if there is one, otherwise
+    poll briefly for the winner's value before giving up and computing it themselves.
+    """
+    token = uuid.uuid4().hex
+    lock_key = _lock_key(key)
+    if not cache.add(lock_key, token, settings.SINGLE_FLIGHT_LOCK_TIMEOUT):
+        stale = cache.get(_stale_key(key))
+        if stale is not None:
+            return stale
+        deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(settings.SINGLE_FLIGHT_POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+    try:
+        value = cache.get(key)
+        if value is not None:
+            return value
+        value = compute()
+        cache.set(key, value, timeout)
+        cache.set(_stale_key(key), value, settings.SINGLE_FLIGHT_STALE_TIMEOUT)
+        return value
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def cached_single_flight(key, compute, timeout):
+    """
+    Returns the cached value for ``key``, recomputing it with ``compute`` on a
+    miss so that only one caller per process, and one per cluster while the
+    lock is held, hits the database.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+    return _flight.do(key, lambda: _recompute(key, compute, timeout))
+
+
+def invalidate(key, drop_stale=False):
+    # The stale copy is kept by default so that the rebuild after an invalidation does not stampede.
+    if drop_stale:
+        cache.delete_many([key, _stale_key(key)])
+    else:
+        cache.delete(key)
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+
+from .images import delete_orphan_variants
+from .models import StoredBlob
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every upload under the SHA-256 of its bytes, e.g.
+    ``post_images/3f/3fa4...c2.png``. The digest is computed while the upload
+    is streamed to a temporary file; if a file with that digest is already on
+    disk the temporary copy is discarded and the existing name is returned.
+    ``StoredBlob`` counts references so a file is only removed when the last
+    one is deleted.
+    """
+    chunk_size = 64 * 1024
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(), collisions are the point.
+        return name
+
+    def _save(self, name, content):
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=full_directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in content.chunks(self.chunk_size):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            hexdigest = digest.hexdigest()
+            name = os.path.join(directory, hexdigest[:2], f"{hexdigest}{extension}").replace('\\', '/')
+            full_path = self.path(name)
+            if os.path.exists(full_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                os.replace(temp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        self._add_reference(name)
+        return name
+
+    @staticmethod
+    def _add_reference(name):
+        if StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1):
+            return
+        try:
+            with transaction.atomic():
+                StoredBlob.objects.create(name=name, ref_count=1)
+        except IntegrityError:
+            StoredBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+    def delete(self, name):
+        """
+        Drops one reference to ``name``; the file itself is removed after commit
+        once nothing refers to it. Files written before this storage was enabled
+        have no ``StoredBlob`` row and are left alone.
+        """
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return
+            if blob.ref_count > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            blob.delete()
+            transaction.on_commit(lambda: self._delete_unreferenced(name))
+
+    def _delete_unreferenced(self, name):
+        # The same bytes may have been uploaded again while the delete was committing.
+        if not StoredBlob.objects.filter(name=name).exists():
+            super().delete(name)
+
+
+def stored_files(instance):
+    """
+    Returns ``(storage, name)`` for each loaded file field of ``instance`` that holds a file.
+    """
+    files = []
+    for field in instance._meta.concrete_fields:
+        if isinstance(field, models.FileField):
+            name = instance.__dict__.get(field.attname)
+            name = getattr(name, 'name', name)
+            if name:
+                files.append((field.storage, name))
+    return files
+
+
+def replaced_files(instance, update_fields=None):
+    """
+    Returns ``(storage, name)`` for each stored file that the save of
+    ``instance`` in progress replaces, as read from its row. Meant for
+    ``pre_save``; hand the result to ``release_files`` once the row is saved.
+    Fields that are deferred and were not assigned cannot have changed and are
+    not read.
+    """
+    if instance._state.adding:
+        return []
+    fields = [
+        field for field in instance._meta.concrete_fields
+        if isinstance(field, models.FileField) and field.attname in instance.__dict__
+        and (update_fields is None or field.name in update_fields)
+    ]
+    if not fields:
+        return []
+    row = type(instance)._base_manager.filter(pk=instance.pk).values_list(*(field.attname for field in fields)).first()
+    if row is None:
+        return []
+    new_names = {field.attname: getattr(getattr(instance, field.attname), 'name', None) for field in fields}
+    return [
+        (field.storage, name) for field, name in zip(fields, row)
+        if name and name != new_names[field.attname]
+    ]
+
+
+def release_files(files):
+    # With content-addressed storage this drops one reference each; shared files stay until unused.
+    for storage, name in files:
+        storage.delete(name)
+        transaction.on_commit(lambda storage=storage, name=name: delete_orphan_variants(storage, name))
@@ -1,3 +1,479 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from post.models import Post
+from shared import images
+from shared.images import render_image_variants, render_variants, schedule_variants, variant_name, variant_urls
+from shared.jobs import claim_jobs, enqueue, ensure_scheduled, job_path, requeue_stale_jobs, run_job
+from shared.mailer import EmailBatchSender
+from shared.models import Job, StoredBlob
+from shared.singleflight import SingleFlight, cached_single_flight
+from shared.sms import LocMemTransport, SmsBatchSender, SmsDispatcher
+from shared.throttling import TokenBucketThrottle
+from shared.utility import deliver_email, deliver_phone_code
+from users.models import User
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RateThrottle(TokenBucketThrottle):
+    THROTTLE_RATES = {'test': '5/hour'}
+
+
+class ThrottledView(APIView):
+    throttle_scope = 'test'
+    throttle_classes = (RateThrottle, )
+
+
+class TokenBucketThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.clock = Clock()
+        self.factory = APIRequestFactory()
+        patcher = mock.patch.object(RateThrottle, 'timer', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def allow(self):
+        throttle = RateThrottle()
+        request = ThrottledView().initialize_request(self.factory.get('/'))
+        return throttle.allow_request(request, ThrottledView()), throttle
+
+    def test_burst_is_capped_at_capacity(self):
+        allowed = [self.allow()[0] for _ in range(10)]
+        self.assertEqual(allowed.count(True), 5)
+        self.assertEqual(allowed[:5], [True] * 5)
+
+    def test_sustained_rate_matches_configured_rate(self):
+        # A client retrying every minute for 10 hours gets the burst plus 5 per hour, no more.
+        allowed = 0
+        for _ in range(600):
+            allowed += self.allow()[0]
+            self.clock.now += 60
+        self.assertLessEqual(allowed, 5 + 50)
+        self.assertGreaterEqual(allowed, 50)
+
+    def test_sustained_rate_of_bursts_after_idle_periods(self):
+        # Bursts of 10 every two hours: each burst finds a full bucket of 5, never more.
+        allowed = 0
+        for _ in range(6):
+            allowed += sum(self.allow()[0] for _ in range(10))
+            self.clock.now += 7199
+        self.assertEqual(allowed, 6 * 5)
+
+    def test_idle_bucket_does_not_exceed_capacity(self):
+        for _ in range(5):
+            self.allow()
+        self.clock.now += 10 * 3600
+        allowed = [self.allow()[0] for _ in range(10)]
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_concurrent_requests_do_not_overdraw(self):
+        # Every thread reads the fresh bucket before any of them takes a token.
+        # Cache connections are per thread, so the patch goes on the backend class.
+        backend = type(caches['default'])
+        barrier, get_many = threading.Barrier(10), backend.get_many
+
+        def read_together(self, *args, **kwargs):
+            values = get_many(self, *args, **kwargs)
+            barrier.wait()
+            return values
+
+        allowed = []
+        with mock.patch.object(backend, 'get_many', read_together):
+            threads = [threading.Thread(target=lambda: allowed.append(self.allow()[0])) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(allowed.count(True), 5)
+        self.assertFalse(self.allow()[0])
+        self.clock.now += 720
+        self.assertTrue(self.allow()[0])
+        self.assertFalse(self.allow()[0])
+
+    def test_rejection_reports_time_until_next_token(self):
+        for _ in range(5):
+            self.allow()
+        allowed, throttle = self.allow()
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(throttle.wait(), 720, delta=1)
+        self.clock.now += 100
+        self.assertAlmostEqual(self.allow()[1].wait(), 620, delta=1)
+        self.clock.now += 620
+        self.assertTrue(self.allow()[0])
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create(username='alice', email='alice@example.com')
+
+    def refs(self):
+        return dict(StoredBlob.objects.values_list('name', 'ref_count'))
+
+    def create_post(self, content):
+        post = Post(author=self.user, caption='caption')
+        post.image.save('upload.png', ContentFile(content), save=False)
+        post.save()
+        return post
+
+    def test_identical_uploads_share_one_file(self):
+        first, second = self.create_post(b'red'), self.create_post(b'red')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refs(), {first.image.name: 2})
+
+    def test_replacing_releases_the_old_file(self):
+        first, second = self.create_post(b'red'), self.create_post(b'red')
+        red = first.image.name
+        first.image = ContentFile(b'blue', name='upload.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertEqual(self.refs(), {red: 1, first.image.name: 1})
+
+        second.image = ContentFile(b'blue', name='upload.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            second.save()
+        self.assertEqual(self.refs(), {first.image.name: 2})
+        self.assertFalse(default_storage.exists(red))
+
+    def test_saving_other_fields_keeps_references(self):
+        post = self.create_post(b'red')
+        post.caption = 'edited'
+        post.save()
+        post.save(update_fields=['caption'])
+        Post.objects.only('caption').get(pk=post.pk).save()
+        self.assertEqual(self.refs(), {post.image.name: 1})
+
+    def test_deleting_releases_references(self):
+        first = self.create_post(b'red')
+        self.create_post(b'red')
+        self.user.photo.save('photo.png', ContentFile(b'red'))
+        image, photo = first.image.name, self.user.photo.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(self.refs(), {image: 1, photo: 1})
+        self.assertTrue(default_storage.exists(image))
+        # The user's posts go with them, so both files lose their last reference.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertEqual(self.refs(), {})
+        self.assertFalse(os.path.exists(default_storage.path(image)))
+        self.assertFalse(os.path.exists(default_storage.path(photo)))
+
+
+class ImageVariantTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, IMAGE_VARIANT_SIZES=(150, 640))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        user = User.objects.create(username='alice', email='alice@example.com')
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, format='PNG')
+        self.post = Post(author=user, caption='caption')
+        self.post.image.save('upload.png', ContentFile(buffer.getvalue()), save=False)
+        self.post.save()
+
+    def test_variants_fit_each_size_and_are_rendered_once(self):
+        path = self.post.image.path
+        self.assertEqual(render_variants(path, (150, 640)), [variant_name(path, 150), variant_name(path, 640)])
+        with Image.open(variant_name(path, 150)) as variant:
+            self.assertEqual(variant.size, (150, 75))
+        self.assertEqual(render_variants(path, (150, 640)), [])
+        self.assertEqual(len(render_variants(path, (150, 640), overwrite=True)), 2)
+
+    def test_urls_follow_the_original_name(self):
+        self.assertIsNone(variant_urls(Post(author=self.post.author).image))
+        urls = variant_urls(self.post.image)
+        self.assertEqual(set(urls), {'150', '640'})
+        self.assertEqual(urls['150'], default_storage.url(variant_name(self.post.image.name, 150)))
+        request = APIRequestFactory().get('/')
+        self.assertTrue(variant_urls(self.post.image, request)['640'].startswith('http://testserver/'))
+
+    def schedule(self, slots):
+        pool = mock.Mock()
+        semaphore = threading.BoundedSemaphore(slots) if slots else threading.Semaphore(0)
+        with mock.patch.object(images, '_get_pool', return_value=pool), mock.patch.object(images, '_slots', semaphore):
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_variants(self.post.image)
+        return pool
+
+    def test_renders_go_to_the_pool_after_commit(self):
+        pool = self.schedule(slots=1)
+        pool.submit.assert_called_once_with(render_variants, self.post.image.path, (150, 640))
+        self.assertFalse(Job.objects.exists())
+
+    def test_saturated_pool_queues_the_render(self):
+        pool = self.schedule(slots=0)
+        pool.submit.assert_not_called()
+        job, = claim_jobs(10)
+        self.assertEqual((job.func, job.kwargs), (job_path(render_image_variants), {'path': self.post.image.path}))
+        self.assertTrue(run_job(job))
+        self.assertTrue(os.path.exists(variant_name(self.post.image.path, 640)))
+
+
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_callers_share_one_call(self):
+        flight, calls, results = SingleFlight(), [], []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return 'value'
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', compute))) for _ in range(8)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_errors_reach_every_waiter_and_are_not_kept(self):
+        flight = SingleFlight()
+        with self.assertRaises(ZeroDivisionError):
+            flight.do('key', lambda: 1 / 0)
+        self.assertEqual(flight.do('key', lambda: 'value'), 'value')
+
+    def test_cached_value_is_served_without_recomputing(self):
+        compute = mock.Mock(return_value={'id': 1})
+        self.assertEqual(cached_single_flight('post', compute, 60), {'id': 1})
+        self.assertEqual(cached_single_flight('post', compute, 60), {'id': 1})
+        self.assertEqual(compute.call_count, 1)
+
+    def test_stale_copy_is_served_while_another_worker_rebuilds(self):
+        cached_single_flight('post', lambda: 'old', 60)
+        cache.delete('post')
+        cache.add('post:lock', 'other worker', 60)
+        compute = mock.Mock(return_value='new')
+        self.assertEqual(cached_single_flight('post', compute, 60), 'old')
+        compute.assert_not_called()
+
+
+JOB_CALLS = []
+
+
+def append_job(value):
+    JOB_CALLS.append(value)
+
+
+def failing_job():
+    raise RuntimeError("boom")
+
+
+@override_settings(JOB_QUEUE_EAGER=False, JOB_RETRY_BACKOFF=10, JOB_LOCK_TIMEOUT=300)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        JOB_CALLS.clear()
+
+    def test_jobs_are_claimed_once_and_only_when_due(self):
+        due = enqueue(append_job, value=1)
+        enqueue(append_job, delay=timedelta(hours=1), value=2)
+        self.assertEqual([job.pk for job in claim_jobs(10)], [due.pk])
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_completed_jobs_are_removed(self):
+        enqueue(append_job, value=1)
+        job, = claim_jobs(10)
+        self.assertTrue(run_job(job))
+        self.assertEqual(JOB_CALLS, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failures_back_off_and_end_in_dead_letters(self):
+        enqueue(failing_job, max_attempts=2)
+        job, = claim_jobs(10)
+        with self.assertLogs('shared.jobs', 'WARNING'):
+            self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("boom", job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        job, = claim_jobs(10)
+        with self.assertLogs('shared.jobs', 'ERROR'):
+            run_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DEAD, 2))
+        self.assertEqual(claim_jobs(10), [])
+
+    def test_periodic_jobs_are_queued_once(self):
+        job = ensure_scheduled(append_job, 60, value=1)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(job.kwargs, {'value': 1})
+        self.assertIsNone(ensure_scheduled(append_job, 60, value=2))
+        self.assertEqual(Job.objects.count(), 1)
+        with override_settings(JOB_QUEUE_EAGER=True):
+            Job.objects.all().delete()
+            self.assertIsNone(ensure_scheduled(append_job, 60, value=3))
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(JOB_CALLS, [])
+
+    def test_jobs_of_dead_workers_are_handed_out_again(self):
+        enqueue(append_job, value=1)
+        job, = claim_jobs(10)
+        self.assertEqual(requeue_stale_jobs(), 0)
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=301))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual([claimed.pk for claimed in claim_jobs(10)], [job.pk])
+
+
+class CountingTransport(LocMemTransport):
+    # Records how many provider calls overlap at most.
+
+    def __init__(self, latency=0.02, fail_to=()):
+        super().__init__(latency)
+        self.fail_to = fail_to
+        self.in_flight = self.peak = 0
+
+    def send(self, to, body):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            if to in self.fail_to:
+                raise ConnectionError("provider unavailable")
+            return super().send(to, body)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class SmsTests(TestCase):
+
+    def dispatcher(self, transport, max_in_flight=3):
+        dispatcher = SmsDispatcher(transport, max_in_flight)
+        self.addCleanup(dispatcher.executor.shutdown)
+        return dispatcher
+
+    def test_fake_transports_keep_their_own_outbox(self):
+        first, second = LocMemTransport(), LocMemTransport()
+        self.assertEqual(first.send('+1', 'a'), '1')
+        self.assertEqual(second.outbox, [])
+        self.assertEqual(first.outbox, [{'to': '+1', 'body': 'a'}])
+
+    def test_dispatcher_bounds_calls_in_flight(self):
+        transport = CountingTransport()
+        messages = [(f'+{i}', f'code {i}') for i in range(12)]
+        sids = self.dispatcher(transport).send_many(messages)
+        self.assertEqual(sorted(sids, key=int), [str(i) for i in range(1, 13)])
+        self.assertEqual(transport.peak, 3)
+        self.assertEqual(sorted(message['to'] for message in transport.outbox), sorted(to for to, _ in messages))
+
+    def test_queued_codes_are_sent_concurrently_in_batches(self):
+        for i in range(7):
+            enqueue(deliver_phone_code, phone=f'+99890{i}', code=f'{i:04d}')
+        transport = CountingTransport()
+        sender = SmsBatchSender(self.dispatcher(transport), batch_size=5)
+        self.assertEqual(sender.drain(), 7)
+        self.assertEqual(transport.peak, 3)
+        self.assertEqual(len(transport.outbox), 7)
+        self.assertIn({'to': '+998900', 'body': "Your verification code is: 0000\n"}, transport.outbox)
+        self.assertEqual(sender.metrics(), {'sent': 7, 'failed': 0})
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_codes_are_retried_later(self):
+        enqueue(deliver_phone_code, phone='+1', code='1234')
+        enqueue(deliver_phone_code, phone='+2', code='1234')
+        sender = SmsBatchSender(self.dispatcher(CountingTransport(fail_to=('+2',))))
+        with self.assertLogs('shared.jobs', 'WARNING'):
+            self.assertEqual(sender.drain(), 2)
+        job = Job.objects.get()
+        self.assertEqual((job.kwargs['phone'], job.status, job.attempts), ('+2', Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("provider unavailable", job.last_error)
+
+
+class RejectingEmailBackend(EmailBackend):
+    # The locmem backend, except that one address bounces.
+
+    def send_messages(self, messages):
+        if any('bounce@example.com' in message.to for message in messages):
+            raise ConnectionError("mailbox unavailable")
+        return super().send_messages(messages)
+
+
+class UnreachableEmailBackend(EmailBackend):
+
+    def open(self):
+        raise ConnectionError("server unreachable")
+
+
+class EmailBatchSenderTests(TestCase):
+
+    def enqueue(self, *addresses):
+        for address in addresses:
+            enqueue(deliver_email, email=address, code='1234')
+
+    def test_each_batch_shares_one_connection(self):
+        self.enqueue(*(f'user{i}@example.com' for i in range(5)))
+        sender = EmailBatchSender(batch_size=2, backend='django.core.mail.backends.locmem.EmailBackend')
+        with mock.patch('shared.mailer.get_connection', wraps=mail.get_connection) as get_connection:
+            self.assertEqual(sender.drain(), 5)
+        self.assertEqual(get_connection.call_count, 3)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual((sender.sent, sender.failed, sender.batches), (5, 0, 3))
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_messages_are_retried_later(self):
+        self.enqueue('alice@example.com', 'bounce@example.com', 'bob@example.com')
+        sender = EmailBatchSender(backend='shared.tests.RejectingEmailBackend')
+        with self.assertLogs('shared.jobs', 'WARNING'):
+            self.assertEqual(sender.drain(), 3)
+        self.assertEqual(sorted(address for message in mail.outbox for address in message.to),
+                         ['alice@example.com', 'bob@example.com'])
+        job = Job.objects.get()
+        self.assertEqual((job.kwargs['email'], job.status, job.attempts), ('bounce@example.com', Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn("mailbox unavailable", job.last_error)
+
+    def test_unreachable_server_fails_the_whole_batch(self):
+        self.enqueue('alice@example.com', 'bob@example.com')
+        sender = EmailBatchSender(backend='shared.tests.UnreachableEmailBackend')
+        with self.assertLogs('shared.jobs', 'WARNING'):
+            self.assertEqual(sender.drain(), 2)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual((sender.sent, sender.failed), (0, 2))
+        jobs = Job.objects.all()
+        self.assertEqual([(job.status, job.attempts) for job in jobs], [(Job.QUEUED, 1)] * 2)
+        self.assertTrue(all("server unreachable" in job.last_error for job in jobs))
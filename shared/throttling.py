@@ -0,0 +1,101 @@
+import hashlib
+
+from rest_framework.throttling import ScopedRateThrottle
+
+
+class TokenBucketThrottle(ScopedRateThrottle):
+    """
+    Token bucket per client IP, per user and per target email or phone number,
+    for views that set ``throttle_scope`` (rates come from ``DEFAULT_THROTTLE_RATES``;
+    ``"5/hour"`` is a bucket of 5 that refills at 5 per hour). A view can name the
+    request field holding the target with ``throttle_target_field``.
+
+    A bucket is a generation ``(number, started_at)`` cached under its key and,
+    under ``key:number``, a counter of the tokens taken since ``started_at``, so
+    the tokens left are ``capacity + elapsed * rate - taken``. A request takes a
+    token with one atomic ``incr`` per bucket and gives it back with ``decr`` if
+    any bucket is empty; concurrent requests can therefore never take more than
+    a bucket holds. Once a bucket would hold more than its capacity, or its
+    generation is a refill period old, the next request starts a new generation
+    carrying over the tokens still missing; ``cache.add`` decides which request
+    seeds it. Entries outlive the time a bucket takes to fill up again, so a
+    missing entry always means a full bucket.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+
+        self.now = self.timer()
+        keys = [self.cache_format % {'scope': self.scope, 'ident': ident} for ident in self.get_idents(request, view)]
+        generations = self.cache.get_many(keys)
+        counters, self.waits = [], []
+        for key in keys:
+            counter, left = self.take_token(key, generations.get(key))
+            counters.append(counter)
+            if left < 1:
+                self.waits.append((1 - left) / self.refill_rate)
+        if self.waits:
+            # A rejected request takes nothing, so hammering does not push Retry-After further out.
+            for counter in counters:
+                self.cache.decr(counter)
+            return False
+        return True
+
+    @property
+    def refill_rate(self):
+        return self.num_requests / self.duration
+
+    @property
+    def timeout(self):
+        # A generation is replaced within one period and holds at most twice the capacity in taken tokens.
+        return 2 * self.duration + 1
+
+    def take_token(self, key, generation):
+        """
+        Takes a token from the bucket under ``key`` and returns the counter it was
+        taken from with the number of tokens the bucket held before.
+        """
+        if generation is None:
+            # Numbering fresh buckets from the clock keeps them clear of counters left by an expired one.
+            generation = (int(self.now * 1000), self.now)
+            if not self.cache.add(key, generation, self.timeout):
+                generation = self.cache.get(key, generation)
+        number, started_at = generation
+        elapsed = self.now - started_at
+        counter = f"{key}:{number}"
+        left = self.num_requests + elapsed * self.refill_rate - (self.incr(counter) - 1)
+        if left <= self.num_requests and elapsed < self.duration:
+            return counter, left
+
+        missing = self.num_requests - min(left, self.num_requests)
+        counter = f"{key}:{number + 1}"
+        if self.cache.add(counter, missing + 1, self.timeout):
+            self.cache.set(key, (number + 1, self.now), self.timeout)
+            return counter, self.num_requests - missing
+        return counter, self.num_requests - (self.incr(counter) - 1)
+
+    def incr(self, counter):
+        try:
+            return self.cache.incr(counter)
+        except ValueError:
+            if self.cache.add(counter, 1, self.timeout):
+                return 1
+            return self.cache.incr(counter)
+
+    def wait(self):
+        return max(self.waits) if self.waits else None
+
+    def get_idents(self, request, view):
+        idents = [f"ip:{self.get_ident(request)}"]
+        if request.user and request.user.is_authenticated:
+            idents.append(f"user:{request.user.pk}")
+        field = getattr(view, 'throttle_target_field', None)
+        target = request.data.get(field) if field and hasattr(request.data, 'get') else None
+        if target:
+            digest = hashlib.sha256(str(target).strip().lower().encode()).hexdigest()[:32]
+            idents.append(f"target:{digest}")
+        return idents
@@ -1,11 +1,11 @@
 import re
-import threading
 import phonenumbers
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
-from decouple import config
 from rest_framework.exceptions import ValidationError
-from twilio.rest import Client
+
+from shared.jobs import enqueue
+from shared.sms import code_message, get_dispatcher
 
 email_regex = re.compile(r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,7}\b")
 phone_regex = re.compile(r'(\+[0-9]+\s*)?(\([0-9]+\))?[\s0-9\-]+[0-9]+')
@@ -49,17 +49,9 @@ def check_user_type(user_input):
         raise ValidationError(data)
     return user_input
 
-class EmailThread(threading.Thread):
-    def __init__(self,email):
-        self.email = email
-        threading.Thread.__init__(self)
-
-    def run(self):
-        self.email.send()
-
 class Email:
     @staticmethod
-    def send_email(data):
+    def build_email(data):
         email = EmailMessage(
             subject=data['subject'],
             body=data['body'],
@@ -67,28 +59,32 @@ class Email:
         )
         if data.get('content_type') == 'html':
             email.content_subtype = 'html'
-        EmailThread(email).start()
+        return email
 
-def send_email(email, code):
+    @staticmethod
+    def send_email(data):
+        Email.build_email(data).send()
+
+def build_code_email(email, code):
     html_content = render_to_string(
         'email/authentication/activate_account.html',
         {'code': code}
     )
-    Email.send_email({
+    return Email.build_email({
         'subject'   :'Pass registration code',
         'to_email': email,
         'body': html_content,
         'content_type':'html'
     })
 
-def send_phone_code(phone, code):
-    account_sid = config('account_sid')
-    auth_token = config('auth_token')
-    client = Client(account_sid, auth_token)
-    client.messages.create(
+def deliver_email(email, code):
+    build_code_email(email, code).send()
 
-        body=f"Your verification code is: {code}\n",
-        from_="+998934542418",
-        to=f"{phone}"
+def deliver_phone_code(phone, code):
+    get_dispatcher().send(f"{phone}", code_message(code)).result()
 
-    )
\ No newline at end of file
+def send_email(email, code):
+    enqueue(deliver_email, email=email, code=code)
+
+def send_phone_code(phone, code):
+    enqueue(deliver_phone_code, phone=phone, code=code)
@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import User, UserConfirmation
+from .models import User, UserConfirmation, UserFollow
 admin.site.register(User)
-admin.site.register(UserConfirmation)
\ No newline at end of file
+admin.site.register(UserConfirmation)
+admin.site.register(UserFollow)
@@ -0,0 +1,114 @@
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CACHED_USER_FIELDS
+
+# Claims added to access tokens at login so that read-only endpoints can skip the lookup altogether.
+TOKEN_CLAIM_FIELDS = ('user_roles', 'AUTH_STATUS')
+
+
+def snapshot_key(user_id, jti):
+    return f"auth-user:{user_id}:{jti}"
+
+
+def version_key(user_id):
+    return f"auth-user-version:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    # Snapshots are only valid next to the version they were stored with; without one, every snapshot misses.
+    cache.delete(version_key(user_id))
+
+
+def snapshot_values(user):
+    # Everything a request usually needs from ``request.user``. The other fields,
+    # the password hash above all, stay out of the cache and load lazily on access.
+    fields = [user._meta.get_field(name) for name in CACHED_USER_FIELDS]
+    return [field.get_prep_value(field.value_from_object(user)) for field in fields]
+
+
+def build_user(field_names, values):
+    # from_db() wants the values in the model's field order.
+    model = get_user_model()
+    by_name = dict(zip(field_names, values))
+    names = [field.attname for field in model._meta.concrete_fields if field.attname in by_name]
+    return model.from_db(DEFAULT_DB_ALIAS, names, [by_name[name] for name in names])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` that keeps a slim snapshot of the user per token in the
+    cache for ``AUTH_USER_CACHE_TIMEOUT`` seconds, so authenticated requests do not
+    look the user up again. Saving a user with a different role, status, password
+    or profile drops its snapshots.
+
+    Views with ``trust_token_claims = True`` go one step further for safe methods
+    when ``JWT_TRUST_CLAIMS_FOR_READS`` is on: the user is built from the token
+    claims alone, which may be up to ``ACCESS_TOKEN_LIFETIME`` out of date. Only
+    access tokens issued at login carry the claims; those minted from a refresh
+    token take the cached lookup instead.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if self.trusts_claims(request):
+            user = self.get_claims_user(validated_token)
+            if user is not None:
+                return user, validated_token
+        return self.get_user(validated_token), validated_token
+
+    @staticmethod
+    def trusts_claims(request):
+        if not settings.JWT_TRUST_CLAIMS_FOR_READS or request.method not in SAFE_METHODS:
+            return False
+        view = getattr(request, 'parser_context', {}).get('view')
+        return getattr(view, 'trust_token_claims', False)
+
+    @staticmethod
+    def get_claims_user(validated_token):
+        try:
+            user_id = get_user_model()._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+            values = [user_id] + [validated_token[field] for field in TOKEN_CLAIM_FIELDS]
+        except (KeyError, ValidationError):
+            # Tokens issued before the claims were added still go through the regular lookup.
+            return None
+        return build_user(('id',) + TOKEN_CLAIM_FIELDS, values)
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = snapshot_key(user_id, validated_token.get(api_settings.JTI_CLAIM))
+        cached = cache.get_many([key, version_key(user_id)])
+        version = cached.get(version_key(user_id))
+        snapshot = cached.get(key)
+        if version is not None and snapshot is not None and snapshot['version'] == version:
+            return build_user(CACHED_USER_FIELDS, snapshot['values'])
+
+        user = super().get_user(validated_token)
+        if version is None:
+            cache.add(version_key(user_id), uuid.uuid4().hex, None)
+            version = cache.get(version_key(user_id))
+        if version is not None:
+            cache.set(key, {'version': version, 'values': snapshot_values(user)}, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
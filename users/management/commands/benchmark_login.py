@@ -0,0 +1,57 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+
+from users.models import User, DONE
+from users.views import LoginView
+
+
+class Command(BaseCommand):
+    help = "Measure login requests per second for username, email and phone logins."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--fast-hasher', action='store_true',
+                            help="Use the MD5 hasher so the numbers show the lookup cost rather than PBKDF2.")
+
+    def handle(self, *args, **options):
+        hashers = ['django.contrib.auth.hashers.MD5PasswordHasher'] if options['fast_hasher'] else None
+        with override_settings(**({'PASSWORD_HASHERS': hashers} if hashers else {})), transaction.atomic():
+            # The account only lives inside this transaction, which is rolled back at the end.
+            suffix = uuid.uuid4().hex[:8]
+            password = f"bench-{suffix}"
+            user = User.objects.create(
+                username=f"bench_{suffix}",
+                email=f"bench_{suffix}@example.com",
+                phone_number=f"+99890{int(suffix, 16) % 10 ** 7:07d}",
+                password=password,
+                AUTH_STATUS=DONE,
+            )
+            for kind, user_input in (('username', user.username.upper()),
+                                     ('email', user.email.upper()),
+                                     ('phone', user.phone_number)):
+                self.run(kind, user_input, password, options['requests'])
+            transaction.set_rollback(True)
+
+    def run(self, kind, user_input, password, count):
+        factory = APIRequestFactory()
+        view = LoginView.as_view()
+        payload = {'userinput': user_input, 'password': password}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = view(factory.post('/users/login/', payload, format='json'))
+        if response.status_code != 200:
+            self.stderr.write(f"{kind}: login failed with {response.status_code}: {response.data}")
+            return
+
+        started = time.monotonic()
+        for _ in range(count):
+            view(factory.post('/users/login/', payload, format='json'))
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f"{kind}: {count / elapsed:,.1f} logins/s ({elapsed / count * 1000:.2f}ms each, {len(queries)} queries)"
+        )
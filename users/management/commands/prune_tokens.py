@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from users.revocation import prune_tokens, schedule_token_pruning
+
+
+class Command(BaseCommand):
+    help = "Delete outstanding and blacklisted refresh tokens that are past REFRESH_TOKEN_LIFETIME."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schedule', action='store_true',
+                            help="Also queue the periodic pruning job for the run_jobs worker.")
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        deleted = prune_tokens(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired refresh tokens."))
+        if options['schedule'] and schedule_token_pruning() is not None:
+            self.stdout.write("Queued the periodic pruning job.")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from users.models import UserConfirmation
+
+
+class Command(BaseCommand):
+    help = "Delete expired and already confirmed rows from the UserConfirmation table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Delete every row, e.g. after switching to the cache-backed code store.")
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        rows = UserConfirmation.objects.all()
+        if not options['all']:
+            rows = rows.filter(Q(expiration_time__lt=timezone.now()) | Q(is_confirmed=True) | Q(expiration_time=None))
+
+        deleted = 0
+        while True:
+            batch = list(rows.values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            deleted += UserConfirmation.objects.filter(pk__in=batch).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} verification codes."))
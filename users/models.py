@@ -1,11 +1,10 @@
-import random
 import uuid
 from datetime import datetime, timedelta
 
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import FileExtensionValidator
 from django.db import models
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.db.models.functions import Upper
 
 from shared.models import BaseModel
 
@@ -20,6 +19,12 @@ CODE_VERIFIED = "code_verified"
 DONE = "done"
 PHOTO_STEP = "photo_step"
 
+# Fields copied into the authentication cache; see users.authentication.
+CACHED_USER_FIELDS = (
+    'id', 'username', 'email', 'phone_number', 'first_name', 'last_name',
+    'user_roles', 'AUTH_TYPE', 'AUTH_STATUS', 'photo', 'is_active', 'is_staff', 'is_superuser',
+)
+
 class User(AbstractUser, BaseModel):
 
     USER_ROLES =(
@@ -46,29 +51,54 @@ class User(AbstractUser, BaseModel):
     email = models.EmailField(unique=True, null=True, blank=True)
     phone_number = models.CharField(unique=True, null=True, blank=True)
     photo = models.ImageField(upload_to="user_photos/", null=True, blank=True, validators=[FileExtensionValidator(['jpg', 'png'])])
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    class Meta(AbstractUser.Meta):
+        # Case-insensitive login lookups; on PostgreSQL ``__iexact`` compiles to UPPER(col) = UPPER(%s).
+        indexes = [
+            models.Index(Upper('username'), name='user_username_upper_idx'),
+            models.Index(Upper('email'), name='user_email_upper_idx'),
+        ]
 
     def __str__(self):
         return self.username
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_auth_state = instance.auth_state()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Deferred fields load through here: what is read now was not changed by this instance.
+        super().refresh_from_db(using, fields, from_queryset)
+        loaded = self.auth_state()
+        if fields is not None:
+            refreshed = {self._meta.get_field(name).attname for name in fields}
+            loaded = {**getattr(self, '_loaded_auth_state', {}), **{name: value for name, value in loaded.items() if name in refreshed}}
+        self._loaded_auth_state = loaded
+
+    def auth_state(self):
+        # Only the fields loaded on this instance, read straight from __dict__ so
+        # that a deferred field is neither loaded nor taken for a changed one.
+        return {field: self.__dict__[field] for field in CACHED_USER_FIELDS + ('password',) if field in self.__dict__}
+
+    def auth_state_changed(self):
+        return getattr(self, '_loaded_auth_state', None) != self.auth_state()
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
     def create_verify_code(self,verify_type):
-        code = "".join([str(random.randint(0, 100) % 10) for _ in range(4)])
-        UserConfirmation.objects.create(
-            user_id=self.id,
-            verify_type=verify_type,
-            code=code
-        )
-        return code
+        from .verification import get_code_store
+        return get_code_store().create(self, verify_type)
 
     def check_username(self):
         if not self.username:
-            temp_username = f"instagram-{uuid.uuid4().__str__().split('-')[-1]}"
-            while User.objects.filter(username=temp_username):
-                temp_username = f"{temp_username} {random.randint(0,9)}"
-            self.username = temp_username
+            from .usernames import allocate_username
+            self.username = allocate_username()
 
     def check_email(self):
         if self.email:
@@ -87,9 +117,14 @@ class User(AbstractUser, BaseModel):
             self.set_password(self.password)
 
     def token(self):
+        from .revocation import RefreshToken
         refresh = RefreshToken.for_user(self)
+        # Only the access token carries the claims, so they are never older than its lifetime.
+        access = refresh.access_token
+        access['user_roles'] = self.user_roles
+        access['AUTH_STATUS'] = self.AUTH_STATUS
         return {
-            "access": str(refresh.access_token),
+            "access": str(access),
             "refresh_token": str(refresh),
         }
 
@@ -103,6 +138,27 @@ class User(AbstractUser, BaseModel):
         self.clean()
         super(User, self).save(*args, **kwargs)
 
+class UsernameSequence(models.Model):
+    """
+    Hi counter for generated usernames on databases without native sequences;
+    PostgreSQL uses the ``users_username_hi_seq`` sequence instead.
+    """
+    value = models.BigIntegerField(default=0)
+
+
+class UserFollow(BaseModel):
+    follower = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='following')
+    following = models.ForeignKey('users.User', on_delete=models.CASCADE, related_name='followers')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'following'], name='userFollowUnique'),
+            models.CheckConstraint(condition=~models.Q(follower=models.F('following')), name='userFollowNotSelf'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower} follows {self.following}"
+
 PHONE_EXPIRE = 2
 EMAIL_EXPIRE = 5
 
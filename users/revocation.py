@@ -0,0 +1,140 @@
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from shared.jobs import ensure_scheduled
+from .authentication import TOKEN_CLAIM_FIELDS
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'token-revocations:version'
+# Rows committed shortly after a sync started can carry an earlier blacklisted_at.
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class RevocationList:
+    """
+    The jtis of blacklisted refresh tokens that have not expired yet, kept in
+    process memory so that a refresh does not query the blacklist tables.
+
+    It is built from the database on first use. Other processes learn about a
+    logout through a version key in the shared cache: when it changes (or is
+    evicted) only the rows blacklisted since the last sync are read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._version = None
+        self._synced_at = None
+
+    def _load(self, since=None):
+        started = timezone.now()
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=started)
+        if since is not None:
+            rows = rows.filter(blacklisted_at__gte=since - SYNC_OVERLAP)
+        for jti, expires_at in rows.values_list('token__jti', 'token__expires_at').iterator():
+            self._revoked[jti] = expires_at
+        self._synced_at = started
+
+    def sync(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+            version = cache.get(VERSION_KEY)
+        with self._lock:
+            if self._synced_at is None:
+                self._load()
+            elif version is None or version != self._version:
+                self._load(since=self._synced_at)
+            self._version = version
+
+    def is_revoked(self, jti):
+        self.sync()
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= timezone.now():
+            self._revoked.pop(jti, None)
+            return False
+        return True
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._revoked[jti] = expires_at
+        transaction.on_commit(lambda: cache.set(VERSION_KEY, uuid.uuid4().hex, None))
+
+    def discard_expired(self):
+        now = timezone.now()
+        with self._lock:
+            self._revoked = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at > now}
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+revocations = RevocationList()
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    Refresh token whose blacklist check is answered by ``revocations`` instead of the database.
+    Access tokens minted from it never inherit the trusted claims, which would
+    otherwise live as long as the refresh token.
+    """
+    no_copy_claims = BaseRefreshToken.no_copy_claims + TOKEN_CLAIM_FIELDS
+
+    def check_blacklist(self):
+        if revocations.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        revocations.add(self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload['exp']))
+        return blacklisted
+
+
+def prune_tokens(batch_size=10000):
+    """
+    Deletes outstanding tokens, and with them their blacklist rows, once they
+    are past ``REFRESH_TOKEN_LIFETIME``: an expired token fails validation before
+    the blacklist is ever consulted. Returns the number of outstanding tokens deleted.
+    """
+    now = timezone.now()
+    lifetime = settings.SIMPLE_JWT['REFRESH_TOKEN_LIFETIME']
+    rows = OutstandingToken.objects.filter(Q(expires_at__lt=now) | Q(created_at__lt=now - lifetime))
+
+    deleted = 0
+    while True:
+        batch = list(rows.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            break
+        BlacklistedToken.objects.filter(token_id__in=batch).delete()
+        deleted += OutstandingToken.objects.filter(pk__in=batch).delete()[0]
+    revocations.discard_expired()
+    return deleted
+
+
+def run_token_pruning():
+    # Periodic job: prunes, then queues its next run.
+    deleted = prune_tokens()
+    logger.info("Pruned %s expired refresh tokens", deleted)
+    schedule_token_pruning()
+
+
+def schedule_token_pruning():
+    # Makes sure one run_token_pruning job is queued for the run_jobs worker.
+    return ensure_scheduled(run_token_pruning, settings.TOKEN_PRUNE_INTERVAL)
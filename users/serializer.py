@@ -1,4 +1,4 @@
-from django.contrib.auth import authenticate
+from django.conf import settings
 from django.contrib.auth.models import update_last_login
 from django.contrib.auth.password_validation import validate_password
 from django.db.models import Q
@@ -8,8 +8,10 @@ from rest_framework.generics import get_object_or_404
 from rest_framework_simplejwt.serializers import TokenObtainSerializer, TokenRefreshSerializer
 from rest_framework_simplejwt.tokens import AccessToken
 
+from shared.images import variant_urls, schedule_variants
 from shared.utility import check_email_or_phone, send_email, send_phone_code, check_user_type
 from .models import User, UserConfirmation, VIA_EMAIL, VIA_PHONE, CODE_VERIFIED, DONE, PHOTO_STEP, NEW
+from .revocation import RefreshToken
 
 
 class SignUpSerializer(serializers.ModelSerializer):
@@ -129,6 +131,14 @@ class ChangeUserInformation(serializers.Serializer):
                     "message": "This username is entirely numeric"
                 }
             )
+        # Generated usernames are handed out without a lookup, so their prefix is reserved.
+        if username.lower().startswith(settings.GENERATED_USERNAME_PREFIX) and \
+                (self.instance is None or username != self.instance.username):
+            raise ValidationError(
+                {
+                    "message": f"Username can not start with '{settings.GENERATED_USERNAME_PREFIX}'"
+                }
+            )
         return username
 
     def update(self, instance, validated_data):
@@ -154,6 +164,7 @@ class ChangeUserPhotoSerializer(serializers.Serializer):
             instance.photo = photo
             instance.AUTH_STATUS = PHOTO_STEP
             instance.save()
+            schedule_variants(instance.photo)
         return instance
 
 
@@ -167,41 +178,35 @@ class LoginSerializer(TokenObtainSerializer):
     def auth_validate(self, data):
 
         user_input = data.get('userinput')
-        if check_user_type(user_input) == 'username':
-            username = user_input
-        elif check_user_type(user_input) == 'email':
-            user = self.get_user(email__iexact=user_input)
-            username = user.username
-        elif check_user_type(user_input) == 'phone':
-            user = self.get_user(phone_number=user_input)
-            username = user.username
+        user_type = check_user_type(user_input)
+        if user_type == 'username':
+            lookup = {'username__iexact': user_input}
+        elif user_type == 'email':
+            lookup = {'email__iexact': user_input}
         else:
-            data = {
-                'success': True,
-                'message': "You must send email, phone number or username"
-            }
-            raise ValidationError(data)
+            lookup = {'phone_number': user_input}
 
-        authentication_kwargs = {
-            self.username_field: username,
-            'password': data['password']
-        }
+        # One indexed lookup; the password is then checked against the row already loaded.
+        user = User.objects.filter(**lookup).first()
+        if user is None:
+            # Hash anyway so that unknown accounts take as long as wrong passwords.
+            User().set_password(data['password'])
+            raise ValidationError({
+                'message': "No active account found"
+            })
 
-        current_user = User.objects.filter(username__iexact=username).first()
-        if current_user.AUTH_STATUS == NEW or current_user.AUTH_STATUS == CODE_VERIFIED and current_user is not None:
+        if user.AUTH_STATUS == NEW or user.AUTH_STATUS == CODE_VERIFIED:
             raise ValidationError({
                 'success': False,
                 'message': "You did not completed registration yet"
             })
 
-        user = authenticate(**authentication_kwargs)
-        if user is not None:
-            self.user = user
-        else:
+        if not user.check_password(data['password']) or not user.is_active:
             raise ValidationError({
                 'success': False,
                 'message': "Login or password is incorrect"
             })
+        self.user = user
 
     def validate(self, data):
         self.auth_validate(data)
@@ -211,16 +216,8 @@ class LoginSerializer(TokenObtainSerializer):
         data['AUTH_STATUS'] = self.user.AUTH_STATUS
         return data
 
-    def get_user(self, **kwargs):
-        users = User.objects.filter(**kwargs)
-        if not users.exists():
-            raise ValidationError({
-                'message': "No active account found"
-            })
-
-        return users.first()
-
 class LoginRefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
 
     def validate(self,attrs):
         data = super().validate(attrs)
@@ -279,6 +276,7 @@ class ResetPasswordSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
+    photo_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -291,8 +289,12 @@ class UserSerializer(serializers.ModelSerializer):
             'AUTH_TYPE',
             'AUTH_STATUS',
             'photo',
+            'photo_variants',
             'full_name'
         ]
 
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}".strip()
+
+    def get_photo_variants(self, obj):
+        return variant_urls(obj.photo, self.context.get('request'))
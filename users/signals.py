@@ -0,0 +1,38 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from shared.storage import release_files, replaced_files, stored_files
+from .authentication import invalidate_cached_user
+from .models import User
+
+
+# Cached snapshots are dropped after commit, so a request racing the save cannot cache the old row again.
+
+@receiver(post_save, sender=User)
+def invalidate_saved_user(sender, instance, **kwargs):
+    if instance.auth_state_changed():
+        transaction.on_commit(lambda: invalidate_cached_user(instance.pk))
+        instance._loaded_auth_state = instance.auth_state()
+
+
+@receiver(post_delete, sender=User)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    # Read the pk now: the collector clears it on the instance before the transaction commits.
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_cached_user(user_id))
+
+
+@receiver(pre_save, sender=User)
+def find_replaced_photo(sender, instance, update_fields=None, **kwargs):
+    instance._replaced_files = replaced_files(instance, update_fields)
+
+
+@receiver(post_save, sender=User)
+def release_replaced_photo(sender, instance, **kwargs):
+    release_files(instance.__dict__.pop('_replaced_files', []))
+
+
+@receiver(post_delete, sender=User)
+def release_user_photo(sender, instance, **kwargs):
+    release_files(stored_files(instance))
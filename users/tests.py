@@ -1,3 +1,204 @@
+import threading
+from itertools import count
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from users import usernames
+from users.authentication import TOKEN_CLAIM_FIELDS, version_key
+from users.models import User, DONE, VIA_EMAIL
+from users.revocation import RefreshToken, RevocationList, prune_tokens, revocations
+from users.usernames import UsernameAllocator
+from users.verification import CacheCodeStore
+
+
+class CacheCodeStoreTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches['verification'].clear()
+        self.store = CacheCodeStore()
+        self.user = User.objects.create(username='alice', email='alice@example.com')
+
+    def test_code_is_checked_once(self):
+        code = self.store.create(self.user, VIA_EMAIL)
+        self.assertTrue(self.store.has_active(self.user))
+        self.assertFalse(self.store.check(self.user, f"{(int(code) + 1) % 10000:04d}"))
+        self.assertTrue(self.store.check(self.user, code))
+        self.assertFalse(self.store.check(self.user, code))
+        self.assertFalse(self.store.has_active(self.user))
+
+    def test_non_ascii_code_is_rejected(self):
+        self.store.create(self.user, VIA_EMAIL)
+        self.assertFalse(self.store.check(self.user, 'é'))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/users/verify/', {'code': 'é'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(self.store.has_active(self.user))
+
+    def test_code_survives_default_cache_culling(self):
+        code = self.store.create(self.user, VIA_EMAIL)
+        for i in range(settings.CACHES['default']['OPTIONS']['MAX_ENTRIES'] + 1):
+            cache.set(f"filler:{i}", i)
+        cache.clear()
+        self.assertTrue(self.store.check(self.user, code))
+
+
+class AuthStateTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='alice', email='alice@example.com')
+        self.user.set_password('secret')
+        self.user.save()
+
+    def save_invalidates(self, user):
+        cache.set(version_key(user.pk), 'v1', None)
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        return cache.get(version_key(user.pk)) is None
+
+    def test_loading_deferred_fields_is_not_a_change(self):
+        user = User.objects.only('id', 'followers_count').get(pk=self.user.pk)
+        # save() reads email, username and password through clean(), loading them one by one.
+        self.assertTrue(user.password)
+        user.followers_count = 3
+        self.assertFalse(self.save_invalidates(user))
+
+    def test_changed_fields_invalidate(self):
+        user = User.objects.only('id').get(pk=self.user.pk)
+        user.set_password('secret')
+        self.assertTrue(self.save_invalidates(user))
+        self.assertFalse(self.save_invalidates(user))
+        user = User.objects.get(pk=self.user.pk)
+        user.email = 'alice@example.org'
+        self.assertTrue(self.save_invalidates(user))
+
+    def test_only_login_access_tokens_carry_claims(self):
+        tokens = self.user.token()
+        access, refresh = AccessToken(tokens['access']), RefreshToken(tokens['refresh_token'])
+        self.assertEqual([access[field] for field in TOKEN_CLAIM_FIELDS], [self.user.user_roles, self.user.AUTH_STATUS])
+        self.assertFalse(any(field in refresh for field in TOKEN_CLAIM_FIELDS))
+        # Refresh tokens issued with the claims must not hand them on either.
+        refresh['AUTH_STATUS'] = self.user.AUTH_STATUS
+        self.assertNotIn('AUTH_STATUS', refresh.access_token)
+
+    def test_deleting_invalidates(self):
+        user_id = self.user.pk
+        cache.set(version_key(user_id), 'v1', None)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertIsNone(cache.get(version_key(user_id)))
+
+
+class UsernameAllocatorTests(TestCase):
+
+    def test_processes_never_hand_out_the_same_name(self):
+        first, second = UsernameAllocator(5), UsernameAllocator(5)
+        names = first.allocate(3) + second.allocate(7) + first.allocate(4) + second.allocate(1) + first.allocate(12)
+        self.assertEqual(len(names), 27)
+        self.assertEqual(len(set(names)), 27)
+        self.assertTrue(all(name.startswith(settings.GENERATED_USERNAME_PREFIX) for name in names))
+
+    def test_threads_share_blocks_without_collisions(self):
+        his = count(1)
+        lock = threading.Lock()
+
+        def next_hi_values(n):
+            with lock:
+                return [next(his) for _ in range(n)]
+
+        allocator, names = UsernameAllocator(10), []
+        with mock.patch.object(usernames, 'next_hi_values', next_hi_values):
+            threads = [threading.Thread(target=lambda: names.extend(allocator.allocate(3))) for _ in range(40)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(names), 120)
+        self.assertEqual(len(set(names)), 120)
+        self.assertLessEqual(next(his), 14)
+
+
+class RevocationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='alice', email='alice@example.com')
+        # Each test starts from the database rather than what earlier tests left in memory.
+        patcher = mock.patch.object(revocations, '_revoked', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(revocations, '_synced_at', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_logout_is_seen_by_other_processes(self):
+        token = RefreshToken.for_user(self.user)
+        other = RevocationList()
+        self.assertFalse(other.is_revoked(token['jti']))
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        with self.assertRaises(TokenError):
+            RefreshToken(str(token))
+        self.assertTrue(other.is_revoked(token['jti']))
+        # A lost version key only costs a resync.
+        cache.clear()
+        self.assertTrue(RevocationList().is_revoked(token['jti']))
+        self.assertTrue(other.is_revoked(token['jti']))
+
+    def test_refresh_checks_do_not_query_the_blacklist(self):
+        token = RefreshToken.for_user(self.user)
+        revocations.sync()
+        with self.assertNumQueries(0):
+            RefreshToken(str(token))
+
+    def test_expired_tokens_are_pruned(self):
+        expired, live = RefreshToken.for_user(self.user), RefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            expired.blacklist()
+            live.blacklist()
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=expired.current_time)
+        self.assertEqual(prune_tokens(), 1)
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [live['jti']])
+        self.assertTrue(revocations.is_revoked(live['jti']))
+
+
+class LoginTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(username='alice', email='alice@example.com', AUTH_STATUS=DONE)
+        self.user.set_password('Secret-123')
+        self.user.save()
+
+    def login(self, userinput, password='Secret-123'):
+        return self.client.post('/users/login/', {'userinput': userinput, 'password': password}, format='json')
+
+    def test_username_or_email_in_any_case(self):
+        for userinput in ('alice', 'ALICE', 'Alice@Example.com'):
+            response = self.login(userinput)
+            self.assertEqual(response.status_code, 200, userinput)
+            self.assertIn('access', response.data)
+
+    def test_user_is_read_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.login('alice').status_code, 200)
+        table = User._meta.db_table
+        reads = [query for query in queries if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']]
+        self.assertEqual(len(reads), 1)
 
-# Create your tests here.
+    def test_wrong_password_and_unknown_user_are_rejected(self):
+        self.assertEqual(self.login('alice', 'wrong').status_code, 400)
+        self.assertEqual(self.login('nobody').status_code, 400)
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import CreateUserView, VerifyAPIView, GetNewVerification,ChangeUserInformationView,\
-        ChangeUserPhotoView, LoginView, LoginRefreshView, LogoutView, ForgotPasswordView, ResetPasswordView
+        ChangeUserPhotoView, LoginView, LoginRefreshView, LogoutView, ForgotPasswordView, ResetPasswordView, FollowAPIView
 
 
 
@@ -15,5 +15,6 @@ urlpatterns = [
         path('change-user-photo/', ChangeUserPhotoView.as_view()),
         path('forgot-password/', ForgotPasswordView.as_view()),
         path('reset-password/', ResetPasswordView.as_view()),
+        path('<uuid:pk>/follow/', FollowAPIView.as_view()),
 
 ]
\ No newline at end of file
@@ -0,0 +1,98 @@
+import string
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import UsernameSequence
+
+_DIGITS = string.digits + string.ascii_lowercase
+
+
+def _base36(number):
+    digits = []
+    while True:
+        number, remainder = divmod(number, 36)
+        digits.append(_DIGITS[remainder])
+        if not number:
+            return ''.join(reversed(digits))
+
+
+def next_hi_values(count):
+    """
+    Reserves ``count`` hi values. On PostgreSQL these come from a sequence, which
+    is never rolled back, so a block can not be handed out twice even if the
+    transaction that asked for it fails.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('users_username_hi_seq') FROM generate_series(1, %s)", [count])
+            return [row[0] for row in cursor.fetchall()]
+    with transaction.atomic():
+        sequence, _ = UsernameSequence.objects.select_for_update().get_or_create(pk=1)
+        UsernameSequence.objects.filter(pk=1).update(value=F('value') + count)
+        return list(range(sequence.value + 1, sequence.value + count + 1))
+
+
+class UsernameAllocator:
+    """
+    Hi/lo allocator for generated usernames: every hi value reserves a block of
+    ``block_size`` numbers that this process hands out without touching the
+    database. Generated names use a prefix that users may not pick themselves,
+    so they can never collide with a chosen username.
+    """
+
+    def __init__(self, block_size):
+        self.block_size = block_size
+        self.lock = threading.Lock()
+        self.next = self.end = 0
+
+    def allocate(self, count=1):
+        ranges = []
+        with self.lock:
+            take = min(self.end - self.next, count)
+            if take:
+                ranges.append((self.next, self.next + take))
+                self.next += take
+            missing = count - take
+            if missing > 0:
+                for hi in next_hi_values(-(-missing // self.block_size)):
+                    start = hi * self.block_size
+                    take = min(missing, self.block_size)
+                    ranges.append((start, start + take))
+                    missing -= take
+                    self.next, self.end = start + take, start + self.block_size
+        prefix = settings.GENERATED_USERNAME_PREFIX
+        return [f"{prefix}{_base36(number)}" for start, end in ranges for number in range(start, end)]
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None:
+            _allocator = UsernameAllocator(settings.USERNAME_BLOCK_SIZE)
+        return _allocator
+
+
+def allocate_username():
+    return get_allocator().allocate()[0]
+
+
+def allocate_usernames(count):
+    return get_allocator().allocate(count)
+
+
+def assign_usernames(users):
+    """
+    Bulk signup helper: fills in generated usernames for every user in ``users``
+    that has none, reserving all the names it needs in one go.
+    """
+    pending = [user for user in users if not user.username]
+    for user, username in zip(pending, allocate_usernames(len(pending))):
+        user.username = username
+    return users
@@ -0,0 +1,85 @@
+import hmac
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import UserConfirmation, VIA_EMAIL, EMAIL_EXPIRE, PHONE_EXPIRE
+
+
+def generate_code():
+    return "".join([str(random.randint(0, 100) % 10) for _ in range(4)])
+
+
+def code_lifetime(verify_type):
+    return timedelta(hours=EMAIL_EXPIRE if verify_type == VIA_EMAIL else PHONE_EXPIRE)
+
+
+class CacheCodeStore:
+    """
+    Keeps the pending code of each user in the ``verification`` cache under a
+    key that expires with the code, so verifying is a single get and nothing is
+    left to clean up. Issuing a new code replaces the previous one.
+    """
+    cache_alias = 'verification'
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @staticmethod
+    def key(user):
+        return f"verify-code:{user.pk}"
+
+    def create(self, user, verify_type):
+        code = generate_code()
+        self.cache.set(self.key(user), code, int(code_lifetime(verify_type).total_seconds()))
+        return code
+
+    def check(self, user, code):
+        expected = self.cache.get(self.key(user))
+        # Bytes, since compare_digest refuses str with non-ASCII characters.
+        if expected is None or code is None or not hmac.compare_digest(expected.encode(), str(code).encode()):
+            return False
+        self.cache.delete(self.key(user))
+        return True
+
+    def has_active(self, user):
+        return self.cache.get(self.key(user)) is not None
+
+
+class DatabaseCodeStore:
+    """
+    The original ``UserConfirmation`` table, kept for deployments without a shared cache.
+    """
+
+    def create(self, user, verify_type):
+        code = generate_code()
+        UserConfirmation.objects.create(
+            user_id=user.id,
+            verify_type=verify_type,
+            code=code
+        )
+        return code
+
+    def check(self, user, code):
+        return bool(
+            user.verify_codes.filter(expiration_time__gte=timezone.now(), code=code, is_confirmed=False)
+            .update(is_confirmed=True)
+        )
+
+    def has_active(self, user):
+        return user.verify_codes.filter(expiration_time__gte=timezone.now(), is_confirmed=False).exists()
+
+
+_store = None
+
+
+def get_code_store():
+    global _store
+    if _store is None:
+        _store = import_string(settings.VERIFICATION_CODE_STORE)()
+    return _store
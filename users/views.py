@@ -1,21 +1,25 @@
-from datetime import datetime
-
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, transaction
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError, NotFound
 from rest_framework.parsers import MultiPartParser, FormParser
 
-from rest_framework.generics import CreateAPIView, UpdateAPIView, GenericAPIView
+from rest_framework.generics import CreateAPIView, UpdateAPIView, GenericAPIView, get_object_or_404
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.exceptions import TokenError
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from drf_yasg.utils import swagger_auto_schema
+from post.counters import adjust_counter
+from post.timeline import backfill_timeline, prune_timeline
+from shared.images import schedule_variants, variant_urls
+from shared.throttling import TokenBucketThrottle
 from shared.utility import send_email, check_email_or_phone
-from .models import User, CODE_VERIFIED, NEW, VIA_EMAIL, VIA_PHONE
+from .models import User, UserFollow, CODE_VERIFIED, NEW, VIA_EMAIL, VIA_PHONE
+from .revocation import RefreshToken
+from .verification import get_code_store
 from .serializer import SignUpSerializer, ChangeUserInformation, ChangeUserPhotoSerializer, LoginSerializer, \
     LoginRefreshSerializer, LogoutSerializer, ForgotPasswordSerializer, ResetPasswordSerializer
 from drf_yasg import openapi
@@ -23,9 +27,14 @@ class CreateUserView(CreateAPIView):
     queryset = User.objects.all()
     permission_classes = (permissions.AllowAny,)
     serializer_class = SignUpSerializer
+    throttle_classes = (TokenBucketThrottle, )
+    throttle_scope = 'signup'
+    throttle_target_field = 'email_phone_number'
 
 class VerifyAPIView(APIView):
     permission_classes = (IsAuthenticated, )
+    throttle_classes = (TokenBucketThrottle, )
+    throttle_scope = 'verify'
     @swagger_auto_schema(
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
@@ -52,14 +61,12 @@ class VerifyAPIView(APIView):
 
     @staticmethod
     def check_verify(user, code):
-        verifies = user.verify_codes.filter(expiration_time__gte=datetime.now(), code=code, is_confirmed=False)
-        if not verifies.exists():
+        if not get_code_store().check(user, code):
             data = {
                 "message": "Your verfication codes is wrong or expired! "
             }
 
             raise ValidationError(data)
-        verifies.update(is_confirmed=True)
         if user.AUTH_STATUS == NEW:
             user.AUTH_STATUS = CODE_VERIFIED
             user.save()
@@ -68,6 +75,9 @@ class VerifyAPIView(APIView):
 
 
 class GetNewVerification(APIView):
+    throttle_classes = (TokenBucketThrottle, )
+    throttle_scope = 'resend_code'
+
     def get(self,request, *args, **kwargs):
         user = self.request.user
         self.check_verification(user)
@@ -89,8 +99,7 @@ class GetNewVerification(APIView):
             })
     @staticmethod
     def check_verification(user):
-        verifies = user.verify_codes.filter(expiration_time__gte=datetime.now(), is_confirmed=False)
-        if verifies.exists():
+        if get_code_store().has_active(user):
             data = {
                 "message": "Your verification code is still valid"
             }
@@ -167,10 +176,12 @@ class ChangeUserPhotoView(APIView):
         user = request.user
         user.photo = file  # Replace 'photo' with your actual user model field for photos
         user.save()
+        schedule_variants(user.photo)
 
         return Response({
             "message": "User's photo updated successfully",
-            "photo_url": request.build_absolute_uri(user.photo.url)
+            "photo_url": request.build_absolute_uri(user.photo.url),
+            "photo_variants": variant_urls(user.photo, request),
         }, status=status.HTTP_200_OK)
 
 class LoginView(TokenObtainPairView):
@@ -201,6 +212,9 @@ class LogoutView(GenericAPIView):
 class ForgotPasswordView(APIView):
     permission_classes = (AllowAny, )
     serializer_class = ForgotPasswordSerializer
+    throttle_classes = (TokenBucketThrottle, )
+    throttle_scope = 'forgot_password'
+    throttle_target_field = 'email_or_phone'
 
     def post(self, request, *args, **kwargs):
         serializer = self.serializer_class(data=request.data)
@@ -242,4 +256,56 @@ class ResetPasswordView(UpdateAPIView):
             "message" : "Password has been reset successfully",
             "access": user.token()['access'],
             "refresh_token": user.token()['refresh_token'],
-        })
\ No newline at end of file
+        })
+
+class FollowAPIView(APIView):
+    permission_classes = (IsAuthenticated, )
+
+    @swagger_auto_schema(
+        operation_summary="Follow a user",
+        operation_description="Allows an authenticated user to follow another user.",
+        responses={201: "Followed successfully"}
+    )
+    def post(self, request, pk):
+        following = get_object_or_404(User, pk=pk)
+        if following.pk == request.user.pk:
+            raise ValidationError({
+                "success": False,
+                "message": "You can not follow yourself"
+            })
+        try:
+            with transaction.atomic():
+                UserFollow.objects.create(follower=request.user, following=following)
+                adjust_counter(User, request.user.pk, 'following_count', 1)
+                adjust_counter(User, following.pk, 'followers_count', 1)
+        except IntegrityError:
+            raise ValidationError({
+                "success": False,
+                "message": "You already follow this user"
+            })
+        backfill_timeline(request.user, following)
+        return Response({
+            "success": True,
+            "message": f"You are now following {following.username}",
+        }, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_summary="Unfollow a user",
+        operation_description="Allows an authenticated user to stop following another user.",
+        responses={204: "Unfollowed successfully"}
+    )
+    def delete(self, request, pk):
+        with transaction.atomic():
+            deleted, _ = UserFollow.objects.filter(follower=request.user, following_id=pk).delete()
+            if not deleted:
+                raise ValidationError({
+                    "success": False,
+                    "message": "You do not follow this user"
+                })
+            adjust_counter(User, request.user.pk, 'following_count', -1)
+            adjust_counter(User, pk, 'followers_count', -1)
+        prune_timeline(request.user, pk)
+        return Response({
+            "success": True,
+            "message": "You unfollowed this user",
+        }, status=status.HTTP_204_NO_CONTENT)